@@ -0,0 +1,89 @@
+''' Model of the MicroPython heap for the host simulation.
+
+    CPython has no gc.mem_alloc() or gc.mem_free(), and frees most memory as
+    soon as it's no longer used, so install() puts in stand-ins which act
+    more like MicroPython's heap: memory which the firmware allocates is
+    counted as used until a collection, whether or not it's still needed.
+    Allocations are found with tracemalloc, as the rise in the peak traced
+    memory between readings, scaled down since CPython objects are a few
+    times bigger than MicroPython's. When the heap fills, a reading triggers
+    a collection, as an allocation would on the board, and the collection
+    takes virtual time in proportion to the memory still in use.
+
+    This is a rough model: allocations are only noticed when the heap is
+    read, and the simulator's own allocations count too. It's meant to show
+    which tasks allocate and how collections interrupt them, not to give
+    exact numbers.
+'''
+import gc
+import tracemalloc
+
+from simclock import clock
+
+# Size of the heap [bytes], about what MicroPython has on the Nucleo L476
+HEAP_SIZE = 96 * 1024
+
+# Ratio of MicroPython object sizes to CPython object sizes
+SIZE_SCALE = 0.3
+
+# Time taken by a collection: a fixed part plus a part for each KB in use [us]
+GC_BASE_US = 300
+GC_US_PER_KB = 40
+
+
+class Heap:
+    '''The stand-in heap. Its methods replace those of the gc module.'''
+
+    def __init__(self, size=HEAP_SIZE):
+        self.size = size
+        self.collections = 0
+        self._real_collect = gc.collect
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._base = tracemalloc.get_traced_memory()[0]
+        self._mark = self._base
+        self._used = 0.0
+        tracemalloc.reset_peak()
+
+    def _live(self):
+        '''The memory still in use by the firmware [bytes].'''
+        current = tracemalloc.get_traced_memory()[0]
+        return max(current - self._base, 0) * SIZE_SCALE
+
+    def _update(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self._used += max(peak - self._mark, 0) * SIZE_SCALE
+        self._mark = current
+        tracemalloc.reset_peak()
+        if self._used >= self.size:
+            self.collect()
+
+    def mem_alloc(self):
+        self._update()
+        return int(self._used)
+
+    def mem_free(self):
+        self._update()
+        return int(self.size - self._used)
+
+    def collect(self):
+        self._real_collect()
+        self._used = self._live()
+        self._mark = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.collections += 1
+        clock.advance(GC_BASE_US + GC_US_PER_KB * self._used / 1024)
+
+
+# The heap being simulated, made by install()
+heap = None
+
+
+def install(size=HEAP_SIZE):
+    '''Make the heap and put its methods in place of the gc module's.'''
+    global heap
+    heap = Heap(size)
+    gc.mem_alloc = heap.mem_alloc
+    gc.mem_free = heap.mem_free
+    gc.collect = heap.collect
+    return heap
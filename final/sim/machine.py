@@ -0,0 +1,32 @@
+''' Stand-in for MicroPython's machine module: idle() and a watchdog.
+'''
+from simclock import clock
+
+
+def idle():
+    clock.wait_for_interrupt()
+
+
+def freq():
+    return 80000000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+class WDT:
+    '''A watchdog which ends the simulation, as a reset would, if it isn't
+       fed within its timeout.'''
+
+    def __init__(self, id=0, timeout=5000):
+        self._timeout = int(timeout) * 1000
+        self._event = clock.call_after(self._timeout, self._expire)
+
+    def feed(self):
+        self._event.cancel()
+        self._event = clock.call_after(self._timeout, self._expire)
+
+    def _expire(self):
+        print("machine.WDT: watchdog timed out, resetting")
+        clock.end_us = clock.us
@@ -0,0 +1,40 @@
+''' Stand-in for the micropython module. The code emitter decorators do
+    nothing, and schedule() queues its call on the virtual clock.
+'''
+from simclock import clock
+
+
+def const(value):
+    return value
+
+
+def native(fn):
+    return fn
+
+
+def viper(fn):
+    return fn
+
+
+def schedule(fn, arg):
+    clock.schedule(fn, arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def mem_info(verbose=False):
+    print("mem: not available in the simulation")
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
@@ -0,0 +1,391 @@
+''' Stand-in for MicroPython's pyb module, covering the parts used by the
+    Romi firmware. Pins and timers keep their state where the robot model
+    in romi.py can read and change it; I2C devices and ADC inputs are
+    supplied by that model too.
+'''
+import sys
+from simclock import clock
+
+# Timer input clock in Hz, used when a timer is set up by prescaler and period
+TIMER_CLOCK = 80000000
+
+
+def disable_irq():
+    return clock.disable_irq()
+
+
+def enable_irq(state=True):
+    clock.enable_irq(state)
+
+
+def wfi():
+    clock.wait_for_interrupt()
+
+
+def delay(ms):
+    clock.advance(int(ms) * 1000)
+
+
+def udelay(us):
+    clock.advance(int(us))
+
+
+def millis():
+    return clock.read() // 1000
+
+
+def micros():
+    return clock.read()
+
+
+def elapsed_millis(start):
+    return millis() - start
+
+
+def elapsed_micros(start):
+    return micros() - start
+
+
+class _CpuPins:
+    '''Pin.cpu namespace: Pin.cpu.C13 is just the name "C13".'''
+
+    def __getattr__(self, name):
+        return name
+
+
+class Pin:
+    '''A GPIO pin. Output levels are kept in Pin.levels by pin name.'''
+
+    IN       = 0
+    OUT_PP   = 1
+    OUT_OD   = 2
+    AF_PP    = 3
+    ANALOG   = 4
+    PULL_NONE = 0
+    PULL_UP   = 1
+    PULL_DOWN = 2
+
+    cpu   = _CpuPins()
+    board = _CpuPins()
+
+    # Level of each pin by name; inputs with pull-ups read high
+    levels = {}
+
+    def __init__(self, id, mode=IN, pull=PULL_NONE, value=None, **kwargs):
+        self._name = id._name if isinstance(id, Pin) else str(id)
+        self.init(mode, pull, value=value)
+
+    def init(self, mode=IN, pull=PULL_NONE, value=None, **kwargs):
+        self._mode = mode
+        if value is not None:
+            Pin.levels[self._name] = 1 if value else 0
+        elif pull == Pin.PULL_UP:
+            Pin.levels.setdefault(self._name, 1)
+        else:
+            Pin.levels.setdefault(self._name, 0)
+
+    def value(self, level=None):
+        if level is None:
+            return Pin.levels.get(self._name, 0)
+        Pin.levels[self._name] = 1 if level else 0
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    on  = high
+    off = low
+
+    def name(self):
+        return self._name
+
+    def pin(self):
+        return int(self._name[1:])
+
+    def port(self):
+        return ord(self._name[0]) - ord('A')
+
+    def __repr__(self):
+        return "Pin(Pin.cpu." + self._name + ")"
+
+
+class TimerChannel:
+    '''One channel of a timer, used for PWM output or encoder input.'''
+
+    def __init__(self, timer, channel, mode, pin, pulse_width_percent):
+        self.timer    = timer
+        self.channel_num = channel
+        self.mode     = mode
+        self.pin      = pin
+        self._percent = pulse_width_percent
+
+    def pulse_width_percent(self, value=None):
+        if value is None:
+            return self._percent
+        self._percent = max(0.0, min(100.0, float(value)))
+
+    def pulse_width(self, value=None):
+        period = self.timer.period() + 1
+        if value is None:
+            return int(self._percent * period / 100)
+        self._percent = 100.0 * value / period
+
+    def callback(self, fn):
+        pass
+
+
+class Timer:
+    '''A hardware timer. Encoder counts are kept in the count attribute by
+       the robot model; a callback is run as an interrupt at the timer's
+       update rate.'''
+
+    PWM        = 0
+    PWM_INVERTED = 1
+    OC_TIMING  = 2
+    OC_ACTIVE  = 3
+    OC_TOGGLE  = 4
+    IC         = 5
+    ENC_A      = 6
+    ENC_B      = 7
+    ENC_AB     = 8
+    UP         = 0
+    DOWN       = 1
+    CENTER     = 2
+
+    # Timers which have been created, by number
+    instances = {}
+
+    def __init__(self, id, **kwargs):
+        self.id        = id
+        self.channels  = {}
+        self.count     = 0
+        self._callback = None
+        self._event    = None
+        self._period   = 0xFFFF
+        self._prescaler = 0
+        Timer.instances[id] = self
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, freq=None, prescaler=0, period=0xFFFF, mode=UP,
+             div=1, callback=None, deadtime=0):
+        if freq is not None:
+            self._rate = float(freq)
+            self._period = max(1, int(TIMER_CLOCK / self._rate) - 1) & 0xFFFF
+        else:
+            self._prescaler = prescaler
+            self._period = period
+            self._rate = TIMER_CLOCK / ((prescaler + 1) * (period + 1))
+        self.callback(callback)
+
+    def deinit(self):
+        self.callback(None)
+        self.channels = {}
+
+    def channel(self, channel, mode=None, pin=None, pulse_width_percent=0,
+                **kwargs):
+        if mode is None:
+            return self.channels.get(channel)
+        ch = TimerChannel(self, channel, mode, pin, pulse_width_percent)
+        self.channels[channel] = ch
+        return ch
+
+    def counter(self, value=None):
+        if value is None:
+            return int(self.count) % (self._period + 1)
+        self.count = value
+
+    def freq(self, value=None):
+        if value is None:
+            return self._rate
+        # As on the board, changing the rate keeps the callback
+        self._rate = float(value)
+        self._period = max(1, int(TIMER_CLOCK / self._rate) - 1) & 0xFFFF
+        self.callback(self._callback)
+
+    def period(self, value=None):
+        if value is None:
+            return self._period
+        self._period = value
+
+    def prescaler(self, value=None):
+        if value is None:
+            return self._prescaler
+        self._prescaler = value
+
+    def source_freq(self):
+        return TIMER_CLOCK
+
+    def callback(self, fn):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        self._callback = fn
+        if fn is not None:
+            period = 1000000.0 / self._rate
+            self._event = clock.call_after(period, self._tick, period)
+
+    def _tick(self):
+        if self._callback is not None:
+            self._callback(self)
+
+
+class ADC:
+    '''An analog input. Readings come from ADC.source, a function which is
+       given the pin name and returns a 12 bit value.'''
+
+    source = None
+
+    def __init__(self, pin):
+        self._name = pin._name if isinstance(pin, Pin) else str(pin)
+
+    def read(self):
+        clock.advance(5)
+        if ADC.source is None:
+            return 0
+        return int(ADC.source(self._name)) & 0xFFF
+
+
+class I2C:
+    '''An I2C bus. Devices are objects with mem_read(addr, n) and
+       mem_write(addr, data) methods, kept in I2C.devices by bus number and
+       address. Each transfer takes as long as it would on the real bus.'''
+
+    CONTROLLER = 0
+    PERIPHERAL = 1
+    MASTER     = 0
+    SLAVE      = 1
+
+    devices = {}
+
+    def __init__(self, bus, mode=CONTROLLER, addr=0x12, baudrate=400000,
+                 **kwargs):
+        self._bus = bus
+        self._baudrate = baudrate
+
+    def init(self, mode=CONTROLLER, addr=0x12, baudrate=400000, **kwargs):
+        self._baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def _transfer(self, nbytes):
+        clock.advance(int((nbytes + 3) * 9 * 1000000 / self._baudrate))
+
+    def _device(self, addr):
+        try:
+            return I2C.devices[self._bus][addr]
+        except KeyError:
+            raise OSError(5) from None
+
+    def scan(self):
+        self._transfer(0)
+        return sorted(I2C.devices.get(self._bus, {}))
+
+    def is_ready(self, addr):
+        return addr in I2C.devices.get(self._bus, {})
+
+    def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        nbytes = data if isinstance(data, int) else len(data)
+        self._transfer(nbytes)
+        values = bytes(self._device(addr).mem_read(memaddr, nbytes))
+        if isinstance(data, int):
+            return values
+        data[:] = values
+        return data
+
+    def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
+        if isinstance(data, int):
+            data = bytes((data & 0xFF,))
+        self._transfer(len(data))
+        self._device(addr).mem_write(memaddr, bytes(data))
+
+
+class ExtInt:
+    '''An external interrupt on a pin. trigger() simulates an edge.'''
+
+    IRQ_RISING         = 0
+    IRQ_FALLING        = 1
+    IRQ_RISING_FALLING = 2
+    EVT_RISING         = 3
+    EVT_FALLING        = 4
+    EVT_RISING_FALLING = 5
+
+    # Interrupts which have been set up, by pin name
+    instances = {}
+
+    def __init__(self, pin, mode, pull, callback):
+        self._pin = pin if isinstance(pin, Pin) else Pin(pin)
+        self._pin.init(Pin.IN, pull)
+        self._callback = callback
+        self._enabled = True
+        ExtInt.instances[self._pin.name()] = self
+
+    def line(self):
+        return self._pin.pin()
+
+    def enable(self):
+        self._enabled = True
+
+    def disable(self):
+        self._enabled = False
+
+    def swint(self):
+        self._fire()
+
+    def _fire(self):
+        if self._enabled and self._callback is not None:
+            self._callback(self.line())
+
+    @staticmethod
+    def trigger(pin_name):
+        '''Simulate an edge on the named pin, running its interrupt if it
+           has one and it's enabled.'''
+        extint = ExtInt.instances.get(pin_name)
+        if extint is not None:
+            clock.call_after(0, extint._fire)
+
+
+class USB_VCP:
+    '''The USB serial port. Output goes to the host's standard output, or
+       into USB_VCP.output if that's set to a bytearray, and input comes from
+       USB_VCP.input, a bytearray which may be filled by the simulation.'''
+
+    input  = bytearray()
+    output = None
+
+    def __init__(self, id=0):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def any(self):
+        return len(USB_VCP.input) > 0
+
+    def read(self, nbytes=None):
+        if not USB_VCP.input:
+            return None
+        if nbytes is None:
+            nbytes = len(USB_VCP.input)
+        data = bytes(USB_VCP.input[:nbytes])
+        del USB_VCP.input[:nbytes]
+        return data
+
+    def readline(self):
+        idx = USB_VCP.input.find(b'\n')
+        return self.read(len(USB_VCP.input) if idx < 0 else idx + 1)
+
+    def write(self, data):
+        if USB_VCP.output is not None:
+            USB_VCP.output.extend(data.encode() if isinstance(data, str)
+                                  else bytes(data))
+            return len(data)
+        if isinstance(data, str):
+            text = data
+        else:
+            text = bytes(data).decode(errors="replace")
+        sys.stdout.write(text.replace("\r\n", "\n"))
+        return len(data)
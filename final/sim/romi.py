@@ -0,0 +1,136 @@
+''' Model of the Romi robot for the host simulation.
+
+    Each wheel is a first-order DC motor driven by the PWM duty cycle, DIR
+    pin and nSLP pin which motor_driver sets up, and its angle is fed to
+    the timer which encoder reads, in encoder counts. The wheel speeds are
+    combined into a heading and yaw rate which a BNO055 register model
+    reports over I2C. Line sensor readings come from a function which may be
+    replaced to draw a line under the robot.
+
+    The model is stepped every millisecond by the virtual clock; like the
+    SysTick interrupt on the Nucleo, this step also wakes the CPU from WFI.
+'''
+import math
+import struct
+
+import pyb
+from simclock import clock
+
+# Wheel radius and track width [mm], as used in task_estimator and task_user
+WHEEL_RADIUS = 35.0
+TRACK_WIDTH  = 149.0
+
+# Encoder counts per wheel revolution, as used in encoder.update()
+COUNTS_PER_REV = 12 * 119.76
+
+# Wheel speed at 100% effort [rad/s] and motor time constant [s]
+SPEED_MAX = 549.0 / WHEEL_RADIUS
+TAU       = 0.1
+
+# Time between model steps [us]
+STEP_US = 1000
+
+# The BNO055 reports angles and rates with 900 counts per radian
+BNO_PER_RAD = 900.0
+
+
+class Wheel:
+    '''One motor, wheel and encoder. The pins and timers are given as they
+       are in main.py.'''
+
+    def __init__(self, pwm_timer, dir_pin, sleep_pin, enc_timer):
+        self.pwm_timer = pwm_timer
+        self.dir_pin   = dir_pin
+        self.sleep_pin = sleep_pin
+        self.enc_timer = enc_timer
+        self.omega     = 0.0        # Wheel speed [rad/s]
+        self.angle     = 0.0        # Wheel angle [rad]
+        self._counted  = 0.0        # Angle last given to the encoder
+
+    def effort(self):
+        '''The effort the motor driver is applying, -100 to 100 percent.'''
+        timer = pyb.Timer.instances.get(self.pwm_timer)
+        if timer is None or not pyb.Pin.levels.get(self.sleep_pin, 0):
+            return 0.0
+        channel = next(iter(timer.channels.values()), None)
+        if channel is None:
+            return 0.0
+        percent = channel.pulse_width_percent()
+        return -percent if pyb.Pin.levels.get(self.dir_pin, 0) else percent
+
+    def step(self, dt):
+        self.omega += (SPEED_MAX * self.effort() / 100.0 - self.omega) \
+            * dt / TAU
+        self.angle += self.omega * dt
+
+        # Move the encoder's timer count along with the wheel
+        timer = pyb.Timer.instances.get(self.enc_timer)
+        if timer is not None:
+            counts = (self.angle - self._counted) * COUNTS_PER_REV \
+                / (2 * math.pi)
+            timer.count += counts
+            self._counted = self.angle
+
+
+class BNO055:
+    '''Register model of the BNO055 IMU, reporting the robot's heading.'''
+
+    def __init__(self, robot):
+        self._robot = robot
+        self._regs = bytearray(0x80)
+        self._regs[0x35] = 0xFF             # Fully calibrated
+
+    def mem_read(self, memaddr, nbytes):
+        if memaddr == 0x1A:
+            heading = self._robot.heading % (2 * math.pi)
+            struct.pack_into("<hhh", self._regs, 0x1A,
+                             int(heading * BNO_PER_RAD), 0, 0)
+        elif memaddr == 0x14:
+            struct.pack_into("<hhh", self._regs, 0x14, 0, 0,
+                             int(self._robot.yaw_rate * BNO_PER_RAD))
+        return self._regs[memaddr:memaddr + nbytes]
+
+    def mem_write(self, memaddr, data):
+        self._regs[memaddr:memaddr + len(data)] = data
+
+
+class Romi:
+    '''The robot: two wheels, the heading they produce and the IMU.'''
+
+    def __init__(self):
+        self.left     = Wheel(3, "B5", "B3", 1)
+        self.right    = Wheel(4, "A7", "A6", 2)
+        self.heading  = 0.0         # [rad], counterclockwise positive
+        self.yaw_rate = 0.0         # [rad/s]
+        self.imu      = BNO055(self)
+
+        # Function giving a line sensor reading from a pin name; by default
+        # the robot sits on plain white paper
+        self.line = lambda pin_name: 300
+
+    def step(self):
+        dt = STEP_US / 1000000.0
+        self.left.step(dt)
+        self.right.step(dt)
+        self.yaw_rate = WHEEL_RADIUS * (self.right.omega - self.left.omega) \
+            / TRACK_WIDTH
+        self.heading += self.yaw_rate * dt
+
+    def distance(self):
+        '''Average distance traveled by the wheels [mm].'''
+        return WHEEL_RADIUS * (self.left.angle + self.right.angle) / 2.0
+
+
+# The robot being simulated, made by install()
+robot = None
+
+
+def install():
+    '''Make the robot, connect it to the stand-in hardware and start
+       stepping it with the clock.'''
+    global robot
+    robot = Romi()
+    pyb.I2C.devices[1] = {0x28: robot.imu}
+    pyb.ADC.source = lambda pin_name: robot.line(pin_name)
+    clock.call_after(STEP_US, robot.step, STEP_US, irq=False)
+    return robot
@@ -0,0 +1,76 @@
+''' Run the Romi firmware on a host computer against the virtual clock.
+
+    Usage:
+        python run_sim.py [module] [--seconds N] [--press T ...] [--bump T ...]
+
+    The stand-in modules in this directory take the place of pyb, utime,
+    machine, micropython and ulab, heap.py adds MicroPython's heap functions
+    to gc, and romi.py models the robot. The given
+    module from ../src (main by default) is imported and its main() run
+    until the virtual clock reaches the end time, when a KeyboardInterrupt
+    is raised just as Ctrl-C would on the board. Button presses and bumps
+    are given as times in seconds from the start.
+'''
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(SIM_DIR), "src")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("module", nargs="?", default="main",
+                        help="module in src whose main() is run")
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="virtual time to run for [s]")
+    parser.add_argument("--press", type=float, nargs="*", default=(),
+                        help="times to press the user button (C13) [s]")
+    parser.add_argument("--bump", type=float, nargs="*", default=(),
+                        help="times to hit the bump sensor (C10) [s]")
+    parser.add_argument("--call-cost", type=float, default=None,
+                        help="microseconds taken by each clock reading")
+    parser.add_argument("--cpu-scale", type=float, default=0.0,
+                        help="host run time multiplier added to the clock")
+    parser.add_argument("--heap", type=int, default=96,
+                        help="size of the MicroPython heap [KB]")
+    args = parser.parse_args(argv)
+
+    sys.path[:0] = [SIM_DIR, SRC_DIR]
+    from simclock import clock, CALL_COST_US
+    import pyb
+    import heap
+    import romi
+
+    clock.reset(CALL_COST_US if args.call_cost is None else args.call_cost,
+                args.cpu_scale)
+    robot = romi.install()
+    for when in args.press:
+        clock.call_at(when * 1e6, lambda: pyb.ExtInt.trigger("C13"))
+    for when in args.bump:
+        clock.call_at(when * 1e6, lambda: pyb.ExtInt.trigger("C10"))
+    clock.end_us = args.seconds * 1e6
+
+    # The firmware writes files such as calibration.txt to the current
+    # directory, so run it somewhere they won't be left behind
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        module = importlib.import_module(args.module)
+
+        # Start counting heap use after the import, as MicroPython's code
+        # for the modules wouldn't be on the heap if it were frozen
+        heap.install(args.heap * 1024)
+        try:
+            module.main()
+        except KeyboardInterrupt:
+            pass
+
+    print(f"\nSimulated {clock.us / 1e6:.3f} s; robot traveled "
+          f"{robot.distance():.1f} mm, heading {robot.heading:.3f} rad")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+''' Virtual clock for running the Romi firmware on a host computer.
+
+    Every stand-in module (utime, pyb, machine, micropython) reads and
+    advances the one clock made here, so the firmware sees a consistent
+    time which has nothing to do with the host's real time:
+
+      - Each reading of the clock costs CALL_COST_US microseconds, so code
+        which polls the clock in a loop sees time go by. If cpu_scale is set,
+        the host's real run time between readings, multiplied by cpu_scale,
+        is added as well.
+      - Sleeps, I2C transfers and waits for interrupts jump the clock ahead
+        without taking any real time, so a simulation runs much faster than
+        real time when the firmware is mostly idle.
+
+    Events such as timer callbacks, pin interrupts and the 1 ms physics step
+    of the robot model are run when the clock passes their times. Callbacks
+    marked as interrupts are held while interrupts are disabled, as on the
+    microcontroller, and functions passed to micropython.schedule() run
+    after any interrupt handler has finished.
+'''
+import heapq
+import time
+
+# Default cost in microseconds of each reading of the clock
+CALL_COST_US = 2
+
+# The ticks_us() and ticks_ms() counters wrap around at this value, just as
+# they do in MicroPython on the STM32
+TICKS_PERIOD = 1 << 30
+
+
+class Event:
+    '''A function to be called at a given time, once or periodically.'''
+
+    def __init__(self, when, fn, period, irq):
+        self.when   = when          # Time of the next call [us]
+        self.fn     = fn            # Function which is called with no args
+        self.period = period        # Time between calls [us], 0 for once
+        self.irq    = irq           # True if the function is an interrupt
+        self.active = True          # Cleared to cancel the event
+
+    def cancel(self):
+        self.active = False
+
+
+class Clock:
+    '''The virtual clock and the queue of events which it runs.'''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, call_cost_us=CALL_COST_US, cpu_scale=0.0):
+        '''Start over at time zero with no events.'''
+        self.us           = 0
+        self.call_cost_us = call_cost_us
+        self.cpu_scale    = cpu_scale
+        self.end_us       = None
+        self.irq_enabled  = True
+        self._events      = []
+        self._seq         = 0
+        self._held        = []
+        self._scheduled   = []
+        self._in_irq      = False
+        self._real_ns     = time.perf_counter_ns()
+
+    def call_at(self, when, fn, period=0, irq=True):
+        '''Call fn at the given time in microseconds, then every period
+           microseconds after that if period isn't zero.'''
+        event = Event(int(when), fn, int(period), irq)
+        self._push(event)
+        return event
+
+    def call_after(self, delay, fn, period=0, irq=True):
+        '''Call fn after the given delay in microseconds.'''
+        return self.call_at(self.us + delay, fn, period, irq)
+
+    def schedule(self, fn, arg):
+        '''Queue a call as micropython.schedule() does. The call is made
+           as soon as no interrupt handler is running.'''
+        self._scheduled.append((fn, arg))
+        if not self._in_irq:
+            self._run_scheduled()
+
+    def read(self):
+        '''Read the clock, which takes a little time, and return the time
+           in microseconds since the simulation began.'''
+        cost = self.call_cost_us
+        if self.cpu_scale:
+            now_ns = time.perf_counter_ns()
+            cost += (now_ns - self._real_ns) * self.cpu_scale / 1000.0
+            self._real_ns = now_ns
+        self.advance(cost)
+        return int(self.us)
+
+    def advance(self, us):
+        '''Move the clock ahead, running each event which falls due.'''
+        target = self.us + us
+        while self._events and self._events[0][0] <= target:
+            when, _, event = heapq.heappop(self._events)
+            if not event.active:
+                continue
+            self.us = max(self.us, when)
+            if event.period:
+                event.when = when + event.period
+                self._push(event)
+            self._fire(event)
+        self.us = max(self.us, target)
+        self._check_end()
+
+    def wait_for_interrupt(self):
+        '''Sleep until the next event, as the WFI instruction does.'''
+        while self._events and not self._events[0][2].active:
+            heapq.heappop(self._events)
+        if self._events:
+            self.advance(max(0, self._events[0][0] - self.us))
+        else:
+            self.advance(1000)
+
+    def disable_irq(self):
+        '''Hold interrupts; returns the previous state.'''
+        state = self.irq_enabled
+        self.irq_enabled = False
+        return state
+
+    def enable_irq(self, state=True):
+        '''Restore the interrupt state, then run any interrupts held.'''
+        self.irq_enabled = state
+        if state and not self._in_irq:
+            while self._held and self.irq_enabled:
+                self._call_irq(self._held.pop(0))
+
+    def _push(self, event):
+        self._seq += 1
+        heapq.heappush(self._events, (event.when, self._seq, event))
+
+    def _fire(self, event):
+        if not event.irq:
+            event.fn()
+        elif self._in_irq or not self.irq_enabled:
+            self._held.append(event.fn)
+        else:
+            self._call_irq(event.fn)
+
+    def _call_irq(self, fn):
+        self._in_irq = True
+        try:
+            fn()
+        finally:
+            self._in_irq = False
+        while self._held and self.irq_enabled:
+            fn = self._held.pop(0)
+            self._in_irq = True
+            try:
+                fn()
+            finally:
+                self._in_irq = False
+        self._run_scheduled()
+
+    def _run_scheduled(self):
+        while self._scheduled and not self._in_irq:
+            fn, arg = self._scheduled.pop(0)
+            fn(arg)
+
+    def _check_end(self):
+        # At the end of the run, interrupt the firmware as Ctrl-C would. This
+        # only happens once so that the firmware can shut down cleanly
+        if self.end_us is not None and self.us >= self.end_us \
+                and not self._in_irq:
+            self.end_us = None
+            raise KeyboardInterrupt
+
+
+# The one clock shared by all the stand-in modules
+clock = Clock()
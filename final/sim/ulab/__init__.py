@@ -0,0 +1,8 @@
+''' Stand-in for the ulab module. If numpy is installed on the host it is
+    used as ulab.numpy; otherwise a small pure Python version covering what
+    the firmware uses is provided.
+'''
+try:
+    import numpy
+except ImportError:
+    from ulab import numpy
@@ -0,0 +1,59 @@
+''' The part of ulab.numpy used by the firmware, in pure Python: 2D arrays
+    made with array(), added with + and multiplied with dot().
+'''
+
+
+class ndarray:
+    '''A two dimensional array of floats, stored as a list of rows.'''
+
+    def __init__(self, rows):
+        self._rows = [[float(x) for x in row] for row in rows]
+
+    @property
+    def shape(self):
+        return (len(self._rows), len(self._rows[0]) if self._rows else 0)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return self._rows[index[0]][index[1]]
+        return self._rows[index]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __add__(self, other):
+        if isinstance(other, ndarray):
+            return ndarray([[a + b for a, b in zip(ra, rb)]
+                            for ra, rb in zip(self._rows, other._rows)])
+        return ndarray([[a + other for a in row] for row in self._rows])
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        return ndarray([[a * other for a in row] for row in self._rows])
+
+    __rmul__ = __mul__
+
+    def tolist(self):
+        return [list(row) for row in self._rows]
+
+    def __repr__(self):
+        return "array(" + repr(self._rows) + ")"
+
+
+def array(values):
+    values = list(values)
+    if values and not isinstance(values[0], (list, tuple, ndarray)):
+        values = [values]
+    return ndarray(values)
+
+
+def dot(a, b):
+    cols = list(zip(*b._rows))
+    return ndarray([[sum(x * y for x, y in zip(row, col)) for col in cols]
+                    for row in a._rows])
+
+
+def zeros(shape):
+    rows, cols = shape if isinstance(shape, tuple) else (1, shape)
+    return ndarray([[0.0] * cols for _ in range(rows)])
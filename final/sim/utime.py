@@ -0,0 +1,46 @@
+''' Stand-in for MicroPython's utime module, driven by the virtual clock.
+'''
+from simclock import clock, TICKS_PERIOD
+
+_MASK = TICKS_PERIOD - 1
+_HALF = TICKS_PERIOD // 2
+
+
+def ticks_us():
+    return clock.read() & _MASK
+
+
+def ticks_ms():
+    return (clock.read() // 1000) & _MASK
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _HALF) & _MASK) - _HALF
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _MASK
+
+
+def time():
+    return clock.read() // 1000000
+
+
+def time_ns():
+    return clock.read() * 1000
+
+
+def sleep(seconds):
+    clock.advance(int(seconds * 1000000))
+
+
+def sleep_ms(ms):
+    clock.advance(int(ms) * 1000)
+
+
+def sleep_us(us):
+    clock.advance(int(us))
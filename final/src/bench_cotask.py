@@ -0,0 +1,194 @@
+''' Scheduler overhead benchmark for cotask.
+    Runs on the Nucleo (or anywhere cotask can be imported) with:
+
+        import bench_cotask
+        bench_cotask.main()
+
+    Each test builds its own TaskList of do-nothing tasks, so the global
+    cotask.task_list used by main.py is left alone. The tasks' periods and
+    priorities are a mix like the one in main.py: harmonic 10, 20 and 200 ms
+    timed tasks plus event-triggered tasks with no period. Since the tasks
+    themselves do nothing, the time per pass is the scheduler's overhead.
+    Each scheduler is timed with plain tasks and again with every task
+    profiled and traced, and the heap memory allocated per pass is found
+    with gc.mem_alloc(); on the Nucleo it should be zero for every row.
+
+    It can also be run on a computer in the simulation, but its clock only
+    moves 2 us for each reading unless the computer's own run time is
+    added, so every row would show about the same few microseconds. To
+    compare the schedulers there, add it with --cpu-scale and leave out the
+    cost of reading the clock:
+
+        python sim/run_sim.py bench_cotask --call-cost 0 --cpu-scale 1 --seconds 60
+
+    The jitter test then runs a 20 ms control task alongside a lower
+    priority task which keeps the CPU busy for varying times, first with the
+    control task polled by the scheduler and then released by a hardware
+    timer, and shows how late the control task started from its profile.
+    With a timer, a step function which runs at each tick is timed as well.
+'''
+import gc
+import cotask
+from utime import ticks_us, ticks_ms, ticks_diff, ticks_add
+
+# Task periods in ms, cycled through as tasks are created. None makes an
+# event-triggered task which only runs after its go() method is called
+PERIODS = (10, 20, 20, 20, 200, None)
+
+# Task counts to be tested
+TASK_COUNTS = (6, 20, 50)
+
+# Number of scheduler passes timed for each test
+PASSES = 2000
+
+# Hardware timer used by the jitter test, and the test's length in seconds
+JITTER_TIMER = 6
+JITTER_SECONDS = 5
+
+# Period of the control task and of the busy task in the jitter test [ms],
+# and the longest time the busy task keeps the CPU [us]
+CONTROL_PERIOD = 20
+BUSY_PERIOD = 7
+BUSY_US = 2000
+
+
+def _nothing():
+    '''Task generator which just yields; its run time is negligible.'''
+    while True:
+        yield 0
+
+
+def _busy():
+    '''Task generator which keeps the CPU for a different time, up to
+       BUSY_US, at each run, so that other tasks' start times wander.'''
+    step = 0
+    while True:
+        step = (step + 3) % 11
+        start = ticks_us()
+        while ticks_diff(ticks_us(), start) < BUSY_US * step // 10:
+            pass
+        yield 0
+
+
+class _StepTimer:
+    '''Step function for a timer-released task which keeps the average
+       and longest delay from each timer tick to the step.'''
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.longest = 0
+
+    def __call__(self, tick):
+        delay = ticks_diff(ticks_us(), tick)
+        self.count += 1
+        self.total += delay
+        if delay > self.longest:
+            self.longest = delay
+
+
+def make_list(num_tasks, profile=False):
+    '''Build a task list holding num_tasks do-nothing tasks, which are
+       profiled and traced if profile is True.'''
+    tasks = cotask.TaskList()
+    for n in range(num_tasks):
+        tasks.append(cotask.Task(_nothing, name="Bench" + str(n),
+                                 priority=n % 3,
+                                 period=PERIODS[n % len(PERIODS)],
+                                 profile=profile, trace=profile))
+    return tasks
+
+
+def per_pass_us(sched, passes=PASSES):
+    '''Time a number of calls to a scheduler method and return the average
+       time per pass in microseconds.'''
+    gc.collect()
+    start = ticks_us()
+    for _ in range(passes):
+        sched()
+    return ticks_diff(ticks_us(), start) / passes
+
+
+def per_pass_bytes(sched, passes=PASSES):
+    '''Count the heap memory allocated by a number of calls to a scheduler
+       method and return the average number of bytes per pass. A collection
+       during the test would spoil the count, so one is done first.'''
+    sched()
+    gc.collect()
+    start = gc.mem_alloc()
+    for _ in range(passes):
+        sched()
+    return (gc.mem_alloc() - start) / passes
+
+
+def _scheds(num_tasks, profile):
+    '''Make the scheduler methods to be tested, each with its own list.'''
+    frames = make_list(num_tasks, profile)
+    frames.build_frames()
+    return (make_list(num_tasks, profile).pri_sched,
+            make_list(num_tasks, profile).dl_sched,
+            make_list(num_tasks, profile).edf_sched,
+            frames.frame_sched)
+
+
+def jitter(seconds=JITTER_SECONDS, timer=None, step=None):
+    '''Run the control task and busy task for a while and return the
+       control task, whose profile shows how late it started. If a timer
+       number is given, the control task is released by that timer.'''
+    tasks = cotask.TaskList()
+    control = cotask.Task(_nothing, name="Control", priority=2,
+                          period=CONTROL_PERIOD, profile=True)
+    if timer is not None:
+        control.use_timer(timer, step)
+    tasks.append(control)
+    tasks.append(cotask.Task(_busy, name="Busy", priority=1,
+                             period=BUSY_PERIOD))
+    gc.collect()
+    end = ticks_add(ticks_ms(), seconds * 1000)
+    while ticks_diff(end, ticks_ms()) > 0:
+        tasks.pri_sched()
+    if timer is not None:
+        control._timer.deinit()
+    return control
+
+
+def _jitter_row(label, avg_us, p95_us, max_us):
+    print(f"{label:<14s}{avg_us:10.0f}{p95_us:10.0f}{max_us:10.0f}")
+
+
+def main(passes=PASSES):
+    print("TASKS  PROFILED  PRI_SCHED us/pass  DL_SCHED us/pass  "
+          "EDF_SCHED us/pass  FRAME_SCHED us/pass")
+    for num_tasks in TASK_COUNTS:
+        for profile in (False, True):
+            pri_us, dl_us, edf_us, frame_us = (
+                per_pass_us(sched, passes)
+                for sched in _scheds(num_tasks, profile))
+            print(f"{num_tasks:5d}{'yes' if profile else 'no':>10s}"
+                  f"{pri_us:19.1f}{dl_us:18.1f}{edf_us:19.1f}"
+                  f"{frame_us:21.1f}")
+
+    print("\nTASKS  PROFILED  PRI_SCHED B/pass    DL_SCHED B/pass    "
+          "EDF_SCHED B/pass   FRAME_SCHED B/pass")
+    for num_tasks in TASK_COUNTS:
+        for profile in (False, True):
+            pri_b, dl_b, edf_b, frame_b = (
+                per_pass_bytes(sched, passes)
+                for sched in _scheds(num_tasks, profile))
+            print(f"{num_tasks:5d}{'yes' if profile else 'no':>10s}"
+                  f"{pri_b:17.1f}{dl_b:19.1f}{edf_b:19.1f}"
+                  f"{frame_b:22.1f}")
+
+    print("\nCONTROL START  AVG us    P95 us    MAX us")
+    polled = jitter()
+    step = _StepTimer()
+    timed = jitter(timer=JITTER_TIMER, step=step)
+    for label, task in (("Polled", polled), ("Timer", timed)):
+        _jitter_row(label, task._late_sum / max(task._runs, 1),
+                    task.percentile(95, late=True), task._latest)
+    _jitter_row("Timer step", step.total / max(step.count, 1),
+                step.longest, step.longest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+''' Queue transfer benchmark for task_share.
+    Runs on the Nucleo (or anywhere task_share can be imported) with:
+
+        import bench_share
+        bench_share.main()
+
+    A queue the size of the step response buffers in main.py is filled and
+    drained over and over, first one item at a time with put() and get(),
+    then all at once with put_many() and get_into(), with and without
+    thread protection and as an SPSCQueue, which needs no protection. The
+    time per item shows what the bulk calls and the SPSC queue save.
+
+    Then the gains are read as in one step of task_motor, first from plain
+    shares, three reads per step, and then from versioned shares, checking
+    for changes and using the cached gains.
+    The queues made here are added to task_share.share_list like any others,
+    so this is best run on its own rather than alongside main.py.
+'''
+import array
+import gc
+from utime import ticks_us, ticks_diff
+from task_share import Queue, SPSCQueue, Share, VersionedShare
+
+# Queue type and size, as for the step response data queues in main.py
+TYPE_CODE = "f"
+SIZE = 50
+
+# Number of times each queue is filled and drained
+ROUNDS = 200
+
+# Number of control steps for which the gains are read
+STEPS = 5000
+
+
+def single_us(queue, items, rounds=ROUNDS):
+    '''Fill and drain a queue one item at a time and return the average
+       time per item in microseconds.'''
+    gc.collect()
+    start = ticks_us()
+    for _ in range(rounds):
+        for item in items:
+            queue.put(item)
+        while queue.any():
+            queue.get()
+    return ticks_diff(ticks_us(), start) / (rounds * len(items))
+
+
+def bulk_us(queue, items, rounds=ROUNDS):
+    '''Fill and drain a queue with one call each way and return the average
+       time per item in microseconds.'''
+    out = array.array(TYPE_CODE, items)
+    gc.collect()
+    start = ticks_us()
+    for _ in range(rounds):
+        queue.put_many(items)
+        queue.get_into(out)
+    return ticks_diff(ticks_us(), start) / (rounds * len(items))
+
+
+def plain_gains_us(kp, ki, steps=STEPS):
+    '''Read the gains from plain shares as task_motor used to, once for
+       the proportional term and twice for the integral term, and return
+       the average time per control step in microseconds.'''
+    gc.collect()
+    start = ticks_us()
+    for _ in range(steps):
+        kp.get()
+        ki.get()
+        ki.get()
+    return ticks_diff(ticks_us(), start) / steps
+
+
+def versioned_gains_us(kp, ki, steps=STEPS):
+    '''Check versioned shares for changes as task_motor does, reading a
+       gain again only when it has changed, and return the average time per
+       control step in microseconds.'''
+    kp_ver = kp.version()
+    ki_ver = ki.version()
+    gc.collect()
+    start = ticks_us()
+    for _ in range(steps):
+        if kp.changed_since(kp_ver):
+            kp_ver = kp.version()
+            kp.get()
+        if ki.changed_since(ki_ver):
+            ki_ver = ki.version()
+            ki.get()
+    return ticks_diff(ticks_us(), start) / steps
+
+
+def _make(kind):
+    '''Make a queue of one of the kinds tested.'''
+    if kind == "spsc":
+        return SPSCQueue(TYPE_CODE, SIZE, name="Bench SPSC")
+    return Queue(TYPE_CODE, SIZE, thread_protect=(kind == "protected"),
+                 name="Bench " + kind)
+
+
+def main(rounds=ROUNDS):
+    items = array.array(TYPE_CODE, range(SIZE))
+    print("QUEUE      PUT/GET us/item  PUT_MANY/GET_INTO us/item  SPEEDUP")
+    for kind in ("plain", "protected", "spsc"):
+        one = single_us(_make(kind), items, rounds)
+        bulk = bulk_us(_make(kind), items, rounds)
+        print(f"{kind:<9s}{one:17.2f}{bulk:27.2f}{one / bulk:9.1f}")
+
+    plain = plain_gains_us(Share("f", name="Bench Kp"),
+                           Share("f", name="Bench Ki"))
+    versioned = versioned_gains_us(VersionedShare("f", name="Bench Kp"),
+                                   VersionedShare("f", name="Bench Ki"))
+    print("\nGAINS      us/step")
+    print(f"Share    {plain:9.2f}")
+    print(f"Versioned{versioned:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,10 +27,99 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 #  POSSIBILITY OF SUCH DAMAGE.
 
+import array                           # Preallocated profiling histograms
 import gc                              # Memory allocation garbage collector
+import struct                          # Packing of binary profile dumps
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
 
+# The function used to put the CPU to sleep until the next interrupt. On the
+# pyboard and Nucleo this is @c machine.idle() or @c pyb.wfi(); elsewhere it
+# does nothing, and it may be replaced by a stand-in when running on a host
+try:
+    from machine import idle as wait_for_interrupt
+except ImportError:
+    try:
+        from pyb import wfi as wait_for_interrupt
+    except ImportError:
+        def wait_for_interrupt():
+            pass
+
+## The number of bins in each profiling histogram. The last bin also counts
+#  everything too long to fit in the others.
+HIST_BINS = micropython.const(32)
+
+## The width in microseconds of each bin in a run duration histogram
+HIST_RUN_US = micropython.const(100)
+
+## The width in microseconds of each bin in a lateness histogram
+HIST_LATE_US = micropython.const(250)
+
+## The number of state transitions kept by a traced task if its @c trace
+#  parameter is @c True rather than a number
+TRACE_LEN = micropython.const(32)
+
+## Late policy for a timed task which has fallen a period or more behind:
+#  release it once for each run time it missed, so that it runs back to
+#  back until it has caught up. This is the default
+CATCH_UP = micropython.const(0)
+
+## Late policy for a timed task which has fallen a period or more behind:
+#  drop the run times it missed and run once, keeping to the times of its
+#  original schedule
+SKIP = micropython.const(1)
+
+## Late policy for a timed task which has fallen a period or more behind:
+#  drop the run times it missed, run once and count each later period
+#  from the time of that release
+REPHASE = micropython.const(2)
+
+## The length of each slot of the rolling load windows in milliseconds
+LOAD_SLOT_MS = micropython.const(100)
+
+## The number of slots in the long load window, which covers 10 seconds
+LOAD_SLOTS = micropython.const(100)
+
+## The number of slots in the short load window, which covers 1 second
+LOAD_SHORT = micropython.const(10)
+
+## The number of garbage collections kept in the log @c gc_log
+GC_LOG_LEN = micropython.const(16)
+
+## The number of period changes kept in the log @c period_log
+PERIOD_LOG_LEN = micropython.const(16)
+
+## The load in thousandths over the last second above which
+#  @c TaskList.adapt() stretches the periods of adaptive tasks by default
+ADAPT_HIGH = micropython.const(800)
+
+## The load in thousandths over the last second below which
+#  @c TaskList.adapt() shrinks the periods of adaptive tasks back by default
+ADAPT_LOW = micropython.const(500)
+
+## Each change by @c TaskList.adapt() stretches a period by this fraction of
+#  itself, or shrinks it by the same ratio, unless a frame table is in use
+ADAPT_STEP = micropython.const(4)
+
+## The largest number of minor frames which @c TaskList.build_frames() will
+#  put in a frame table. Harmonic periods keep the table short
+FRAMES_MAX = micropython.const(100)
+
+# Bits of Task._flags, which are worked out from a task's settings so that
+# each run tests one integer rather than several attributes
+_F_POLL   = micropython.const(1)    # Released by polling the clock
+_F_TIMED  = micropython.const(2)    # Start and end of each run are timed
+_F_PROF   = micropython.const(4)    # Profiled
+_F_BUDGET = micropython.const(8)    # Has a time budget
+_F_ALLOC  = micropython.const(16)   # Heap allocation is measured
+_F_LOAD   = micropython.const(32)   # Run time goes into the load windows
+_F_TRACE  = micropython.const(64)   # State transitions are traced
+
+## The shortest time in microseconds until the next task is due for which
+#  @c idle_wait() will sleep. The SysTick interrupt wakes the CPU every
+#  millisecond, so a sleep may last up to that long.
+IDLE_WAIT_MIN_US = 1000
+
 
 ## Implements multitasking with scheduling and some performance logging.
 #
@@ -63,6 +152,11 @@ import micropython                     # This shuts up incorrect warnings
 #        while True: 
 #            cotask.task_list.pri_sched ()
 #    @endcode
+#
+#  Instead of a state, a task may yield a @c Wait object such as @c Sleep,
+#  @c WaitQueue or @c WaitChange. The task is then parked: the scheduler
+#  doesn't run it again until the wait is over, while other tasks keep
+#  running. Wait objects may be created once and yielded again and again.
 class Task:
 
     ## Initialize a task object so it may be run by the scheduler.
@@ -81,12 +175,44 @@ class Task:
     #         The time can be given in a @c float or @c int; it will be 
     #         converted to microseconds for internal use by the scheduler.
     #  @param profile Set to @c True to enable run-time profiling 
-    #  @param trace Set to @c True to generate a list of transitions between
-    #         states. @b Note: This slows things down and allocates memory.
+    #  @param trace Set to @c True or to a number of transitions to keep a
+    #         record of the most recent transitions between states. The
+    #         record is a ring buffer allocated here, holding @c TRACE_LEN
+    #         transitions if @c True is given, so tracing costs little time
+    #         and no further memory while the task runs
     #  @param shares A list or tuple of shares and queues used by this task.
     #         If no list is given, no shares are passed to the task
+    #  @param deadline The time in milliseconds after each release by which
+    #         a timed task should have finished running. By default it's the
+    #         task's period. Tasks with no period, or a period of zero, have
+    #         no deadline
+    #  @param budget The longest time in milliseconds which one run of the
+    #         task should take, or @c None if it isn't checked. Runs which
+    #         take longer are counted as overruns
+    #  @param on_overrun A function which is called after a run which went
+    #         over budget, for example to stop the motors. It's called with
+    #         the task and the run time in microseconds
+    #  @param critical Set to @c True if the task must keep meeting its
+    #         deadlines for the watchdog set up by @c TaskList.set_watchdog()
+    #         to be fed. Critical tasks are always profiled
+    #  @param late_policy What a timed task does when it has fallen a
+    #         period or more behind, for instance after a long blocking call
+    #         in another task: @c CATCH_UP, @c SKIP or @c REPHASE
+    #  @param alloc Set to @c True to measure the heap memory allocated by
+    #         each run with @c gc.mem_alloc(). This also finds garbage
+    #         collections which happen while the task runs and logs them in
+    #         @c gc_log
+    #  @param min_period The shortest period in milliseconds to which
+    #         @c TaskList.adapt() may shrink the task's period, or @c None
+    #  @param max_period The longest period in milliseconds to which
+    #         @c TaskList.adapt() may stretch the task's period, or @c None.
+    #         If either limit is given the task is adaptive, and the other
+    #         limit defaults to the period. Critical tasks aren't adapted
     def __init__(self, run_fun, name="NoName", priority=0, period=None,
-                 profile=False, trace=False, shares=()):
+                 profile=False, trace=False, shares=(), deadline=None,
+                 budget=None, on_overrun=None, critical=False,
+                 late_policy=CATCH_UP, alloc=False, min_period=None,
+                 max_period=None):
         # The function which is run to implement this task's code. Since it 
         # is a generator, we "run" it here, which doesn't actually run it but
         # gets it going as a generator which is ready to yield values
@@ -114,25 +240,125 @@ class Task:
             self.period = period
             self._next_run = None
 
+        # The relative deadline in microseconds, or zero if the task has no
+        # deadline, and the absolute deadline of the task's latest release
+        if deadline != None and period:
+            self._rel_deadline = int(deadline * 1000)
+        elif period:
+            self._rel_deadline = self.period
+        else:
+            self._rel_deadline = 0
+        self._deadline = 0
+        self._released = False
+
+        # The range of periods in microseconds which TaskList.adapt() may
+        # choose from, or zeros if the task keeps its period, the number of
+        # times the period has been changed and the period before the latest
+        # change, which is put back if the change doesn't fit a frame table
+        if period and (min_period is not None or max_period is not None):
+            self._min_period = self.period if min_period is None \
+                else int(min_period * 1000)
+            self._max_period = self.period if max_period is None \
+                else int(max_period * 1000)
+            if not 0 < self._min_period <= self.period <= self._max_period:
+                raise ValueError(name + " period must be within its range")
+        else:
+            self._min_period = 0
+            self._max_period = 0
+        self._adapts = 0
+        self._old_period = 0
+
         # Flag which causes the task to be profiled, in which the execution
         #  time of the @c run() method is measured and basic statistics kept. 
-        self._prof = profile
+        #  Histograms of run durations and lateness are allocated up front so
+        #  that profiling doesn't allocate memory while the task runs
+        self._prof = profile or critical
+        self._alloc = alloc
+        if self._prof:
+            self._run_hist = array.array('L', [0] * HIST_BINS)
+            self._late_hist = array.array('L', [0] * HIST_BINS)
+        else:
+            self._run_hist = None
+            self._late_hist = None
         self.reset_profile()
 
+        # The time budget for each run in microseconds, or zero if runs
+        # aren't checked, and the function to call after an overrun
+        self._budget = int(budget * 1000) if budget else 0
+
+        ## A function called with the task and run time in microseconds after
+        #  a run which went over the task's time budget, or @c None
+        self.on_overrun = on_overrun
+
+        ## Whether the task must meet its deadlines for the watchdog to be fed
+        self.critical = critical
+
+        ## What the task does when it has fallen a period or more behind:
+        #  @c CATCH_UP, @c SKIP or @c REPHASE
+        self.late_policy = late_policy
+
+        # Run, miss and overrun counts when the watchdog window last began
+        self._wd_runs = 0
+        self._wd_faults = 0
+
         # The previous state in which the task last ran. It is used to watch
         # for and track state transitions.
         self._prev_state = 0
 
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
-        self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us()
+        # If transition tracing has been enabled, create a ring buffer in
+        # which to store (time, to-state) stamps, packed one after another
+        # into an array. The index is where the next stamp will be written
+        self._trace = bool(trace)
+        if trace:
+            length = TRACE_LEN if trace is True else int(trace)
+            self._tr_data = array.array('l', [0] * (2 * length))
+        else:
+            self._tr_data = None
+        self._tr_idx = 0
+        self._tr_count = 0
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
         self.go_flag = False
 
+        # Flag which is set while the task waits in the deadline queue used
+        # by @c TaskList.dl_sched(), and the task list whose queue that is
+        self._queued = False
+        self._tasks = None
+
+        # The wait object which the task yielded to park itself, or None
+        # if the task isn't parked
+        self._wait = None
+
+        # The time at which go() was called if the task is profiled, or zero.
+        # For a timed task, the time of the first call since its last run is
+        # kept apart, so that the delay from events to runs can be shown
+        # without being mixed into the lateness of its releases
+        self._go_time = 0
+        self._event_time = 0
+
+        # The hardware timer which releases the task if use_timer() has been
+        # called, or None if the scheduler polls the clock, and the step
+        # function run at each tick
+        self._timer = None
+        self._step = None
+
+        # True if the task is in the frame table of TaskList.build_frames(),
+        # so that frame_sched() releases it only at the start of its frames
+        self._framed = False
+
+        # The run time in microseconds in each slot of the rolling load
+        # windows, a ring allocated by TaskList.track_load(), or None. Then
+        # the run time so far in the current slot and the totals over the
+        # short and long windows
+        self._load_ring = None
+        self._slot_busy = 0
+        self._busy_short = 0
+        self._busy_long = 0
+
+        # Which kinds of data the task keeps and how it's released, as bits
+        self._set_flags()
+
 
     ## This method is called by the scheduler; it attempts to run this task.
     #  If the task is not yet ready to run, this method returns @c False
@@ -142,87 +368,328 @@ class Task:
     #  @return @c True if the task ran or @c False if it did not
     def schedule(self) -> bool:
         if self.ready():
+            self._run()
+            return True
+
+        else:
+            return False
 
-            # Reset the go flag for the next run
-            self.go_flag = False
 
-            # If profiling, save the start time
-            if self._prof:
-                stime = utime.ticks_us()
+    ## This method runs the task's generator up to its next @c yield() and
+    #  keeps the profiling and trace data. It doesn't check whether the task
+    #  is ready; schedulers which already know that the task is ready, such
+    #  as @c TaskList.dl_sched(), call it directly. Which kinds of data are
+    #  kept is worked out beforehand in @c _flags, so a task which keeps
+    #  none costs only a few integer tests besides the run itself.
+    @micropython.native
+    def _run(self):
+        # Reset the go flag for the next run
+        self.go_flag = False
+
+        # If profiling, checking the time budget, measuring allocation or
+        # keeping the load windows, save the start time. If the task was
+        # triggered by go(), record how long it took to start
+        flags = self._flags
+        if flags & _F_TIMED:
+            stime = utime.ticks_us()
+            if self._go_time:
+                self._record_late(utime.ticks_diff(stime, self._go_time))
+                self._go_time = 0
+            if self._event_time:
+                late = utime.ticks_diff(stime, self._event_time)
+                self._events += 1
+                self._event_sum += late
+                if late > self._event_latest:
+                    self._event_latest = late
+                self._event_time = 0
 
-            # Run the method belonging to the state which should be run next
+        # Run the method belonging to the state which should be run next,
+        # noting how much heap memory it allocates if asked to
+        if flags & _F_ALLOC:
+            alloc = gc.mem_alloc()
             curr_state = next(self._run_gen)
+            alloc = gc.mem_alloc() - alloc
+        else:
+            curr_state = next(self._run_gen)
+
+        # If the task yielded a wait object, start waiting; the task is
+        # parked until the wait is over. The state hasn't changed
+        if isinstance(curr_state, Wait):
+            curr_state.arm()
+            self._wait = curr_state
+            curr_state = self._prev_state
 
-            # If profiling or tracing, save timing data
-            if self._prof or self._trace:
-                etime = utime.ticks_us()
+        if flags & _F_TIMED:
+            etime = utime.ticks_us()
+            runt = utime.ticks_diff(etime, stime)
+            if flags & _F_LOAD:
+                self._slot_busy += runt
+
+            # If the run took longer than its budget, count an overrun, note
+            # when it happened and call the overrun handler if there is one
+            if flags & _F_BUDGET and runt > self._budget:
+                self._overruns += 1
+                self._last_overrun = etime
+                if self.on_overrun is not None:
+                    self.on_overrun(self, runt)
+
+            # If less memory is allocated after the run than before, the
+            # garbage collector ran during it, so log the run as a pause;
+            # otherwise add the memory it allocated to the total
+            if flags & _F_ALLOC:
+                if alloc < 0:
+                    gc_log.record(self, etime, runt)
+                else:
+                    self._alloc_runs += 1
+                    self._alloc_sum += alloc
 
             # If profiling, save timing data
-            if self._prof:
+            if flags & _F_PROF:
                 self._runs += 1
-                runt = utime.ticks_diff(etime, stime)
                 if self._runs > 2:
                     self._run_sum += runt
                     if runt > self._slowest:
                         self._slowest = runt
+                    idx = runt // HIST_RUN_US
+                    if idx >= HIST_BINS:
+                        idx = HIST_BINS - 1
+                    self._run_hist[idx] += 1
 
-            # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
-            if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append(
-                            (utime.ticks_diff(etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect()
-
-                self._prev_state = curr_state
-                self._prev_time = etime
+                # Count a deadline miss if a run which followed a release by
+                # the timer finished after the deadline
+                if self._released:
+                    self._released = False
+                    if utime.ticks_diff(etime, self._deadline) > 0:
+                        self._misses += 1
 
-            return True
+        # If transition logic tracing is on, record a transition in the ring
+        # buffer, overwriting the oldest one; if not, ignore the state. Only
+        # integer states can be traced; tasks which yield None aren't
+        if flags & _F_TRACE:
+            if curr_state != self._prev_state and isinstance(curr_state, int):
+                if not flags & _F_TIMED:
+                    etime = utime.ticks_us()
+                idx = self._tr_idx
+                self._tr_data[idx] = etime
+                self._tr_data[idx + 1] = curr_state
+                idx += 2
+                if idx >= len(self._tr_data):
+                    idx = 0
+                self._tr_idx = idx
+                self._tr_count += 1
 
-        else:
-            return False
+            self._prev_state = curr_state
+
+
+    ## Work out the flags in @c _flags from the task's settings. This is
+    #  called whenever a setting which they depend on is changed.
+    def _set_flags(self):
+        flags = 0
+        if self.period is not None and self._timer is None:
+            flags |= _F_POLL
+        if self._prof:
+            flags |= _F_PROF
+        if self._budget:
+            flags |= _F_BUDGET
+        if self._alloc:
+            flags |= _F_ALLOC
+        if self._load_ring is not None:
+            flags |= _F_LOAD
+        if flags & (_F_PROF | _F_BUDGET | _F_ALLOC | _F_LOAD):
+            flags |= _F_TIMED
+        if self._trace:
+            flags |= _F_TRACE
+        self._flags = flags
 
 
     ## This method checks if the task is ready to run.
     #  If the task runs on a timer, this method checks what time it is; if not,
     #  this method checks the flag which indicates that the task is ready to
-    #  go. This method may be overridden in descendent classes to implement
-    #  some other behavior.
-    @micropython.native
+    #  go. The schedulers read the clock once per pass and call @c _poll()
+    #  with that time instead, so descendent classes which implement some
+    #  other behavior should override @c _poll().
     def ready(self) -> bool:
+        return self._poll(utime.ticks_us())
+
+
+    ## This method checks if the task is ready to run as of a given time.
+    #  @param now The time, from @c utime.ticks_us(), of the current pass
+    #  @return @c True if the task should be run now
+    @micropython.native
+    def _poll(self, now) -> bool:
+        # If this task is parked, it isn't ready until its wait is over
+        if self._wait is not None:
+            if not self._wait.done():
+                return False
+            self._wake()
+
         # If this task uses a timer, check if it's time to run run() again. If
-        # so, set go flag and set the timer to go off at the next run time
-        if self.period != None:
-            late = utime.ticks_diff(utime.ticks_us(), self._next_run)
-            if late > 0:
-                self.go_flag = True
-                self._next_run = utime.ticks_diff(self.period, 
-                                                  -self._next_run)
-
-                # If keeping a latency profile, record the data
-                if self._prof:
-                    self._late_sum += late
-                    if late > self._latest:
-                        self._latest = late
+        # so, set go flag and set the timer to go off at the next run time.
+        # Tasks released by a hardware timer just use the go flag
+        if self._flags & _F_POLL \
+                and utime.ticks_diff(now, self._next_run) > 0:
+            self._release(now)
 
         # If the task doesn't use a timer, we rely on go_flag to signal ready
         return self.go_flag
 
 
+    ## This method makes a parked task ready to run because its wait is over.
+    #  A timed task's next run is scheduled one period from now rather than
+    #  at the times it would have run while parked.
+    def _wake(self):
+        self._wait = None
+        self.go_flag = True
+        if self.period is not None:
+            self._next_run = utime.ticks_add(utime.ticks_us(), self.period)
+
+
+    ## This method marks a timed task as ready because its run time has come
+    #  and sets the time of its next run. It's called by @c ready() and by
+    #  @c TaskList.dl_sched(), which has already found that the task is due.
+    #  If the task has fallen a period or more behind, the periods it missed
+    #  are counted and its late policy decides when it next runs.
+    #  @param now The time, from @c utime.ticks_us(), of the current pass
+    @micropython.native
+    def _release(self, now):
+        slot = self._next_run
+        late = utime.ticks_diff(now, slot)
+        period = self.period
+        if period and late >= period:
+            if self.late_policy == CATCH_UP:
+                self._missed += 1
+            else:
+                missed = late // period
+                self._missed += missed
+                if self.late_policy == SKIP:
+                    slot = utime.ticks_add(slot, missed * period)
+                    late -= missed * period
+                else:
+                    slot = now
+
+        self.go_flag = True
+        self._released = self._rel_deadline != 0
+        self._deadline = utime.ticks_add(slot, self._rel_deadline)
+        self._next_run = utime.ticks_add(slot, period)
+
+        # If keeping a latency profile, record the data
+        if self._flags & _F_PROF:
+            self._record_late(late)
+
+
+    ## Release this task from a hardware timer rather than by polling the
+    #  clock. The timer interrupts once each period; the interrupt notes the
+    #  time and uses @c micropython.schedule() to release the task as soon
+    #  as the code running then, usually another task, reaches the end of a
+    #  bytecode. The task then runs at the scheduler's next pass, and its
+    #  lateness in the task table is the time from the tick to the start of
+    #  the run. A step function may also be given which runs at each tick,
+    #  before the task is released, for short jobs which need exact timing.
+    #  Each tick releases the task once, so its late policy isn't used.
+    #  Call this before the task is appended to a task list.
+    #  @param timer The number of a hardware timer which isn't used for
+    #         anything else, such as 6 or 7 on the Nucleo
+    #  @param step A function which is called with the time of each tick
+    #         from @c utime.ticks_us(), or @c None. It runs in the middle of
+    #         other tasks' code, so it must be short and mustn't change
+    #         anything they use
+    def use_timer(self, timer, step=None):
+        from pyb import Timer
+        if not self.period:
+            raise ValueError(self.name + " needs a period to use a timer")
+        self._step = step
+
+        # Make the bound method for micropython.schedule() here, as the
+        # interrupt can't allocate memory
+        self._release_ref = self._timer_release
+        self._timer = Timer(timer, freq=1000000 / self.period,
+                            callback=self._timer_tick)
+        self._set_flags()
+
+
+    ## Timer callback which runs in an interrupt at each tick and schedules
+    #  the task's release. If the schedule queue is full, the tick is lost
+    #  and counted as a missed period.
+    #  @param timer The timer which caused the interrupt
+    def _timer_tick(self, timer):
+        try:
+            micropython.schedule(self._release_ref, utime.ticks_us())
+        except RuntimeError:
+            self._missed += 1
+
+
+    ## Release the task at a timer tick. This is run by
+    #  @c micropython.schedule() soon after each tick. If the task hasn't run
+    #  since the last tick, that period is counted as missed.
+    #  @param tick The time of the tick from @c utime.ticks_us()
+    def _timer_release(self, tick):
+        if self._step is not None:
+            self._step(tick)
+        if self.go_flag:
+            self._missed += 1
+        self._released = self._rel_deadline != 0
+        self._deadline = utime.ticks_add(tick, self._rel_deadline)
+        self._next_run = utime.ticks_add(tick, self.period)
+        if self._prof:
+            self._go_time = tick
+        self.go_flag = True
+
+
+    ## This method adds a measurement of how late the task was released to
+    #  the latency profile.
+    #  @param late The time in microseconds by which the task was late
+    @micropython.native
+    def _record_late(self, late):
+        self._late_sum += late
+        if late > self._latest:
+            self._latest = late
+        idx = late // HIST_LATE_US
+        if idx >= HIST_BINS:
+            idx = HIST_BINS - 1
+        self._late_hist[idx] += 1
+
+
     ## This method sets the period between runs of the task to the given
     #  number of milliseconds, or @c None if the task is triggered by calls
-    #  to @c go() rather than time.
+    #  to @c go() rather than time. The next run of a timed task is moved to
+    #  one new period after its latest run time, or to one period from now
+    #  if it had no period, and an implicit deadline follows the period. The
+    #  task is put in its place in the deadline queue of its task list, or
+    #  taken out of the queue if it no longer has a period.
     #  @param new_period The new period in milliseconds between task runs
     def set_period(self, new_period):
+        old_period = self.period
         if new_period is None:
             self.period = None
         else:
             self.period = int(new_period) * 1000
+            if old_period is None:
+                self._next_run = utime.ticks_add(utime.ticks_us(),
+                                                 self.period)
+            else:
+                self._next_run = utime.ticks_add(self._next_run,
+                                                 self.period - old_period)
+        if self._rel_deadline == old_period:
+            self._rel_deadline = self.period or 0
+        self._set_flags()
+        if self._tasks is not None:
+            self._tasks._requeue(self)
+
+
+    ## Change the period of a timed task because of the load, keeping an
+    #  implicit deadline equal to the period and setting the task's timer
+    #  to the new rate if it has one. The change is logged in
+    #  @c period_log. The next run keeps the time already set for it.
+    #  @param new_period The new period in microseconds
+    #  @param load The load which led to the change, in thousandths
+    def _change_period(self, new_period, load):
+        if self._rel_deadline == self.period:
+            self._rel_deadline = new_period
+        self.period = new_period
+        if self._timer is not None:
+            self._timer.freq(1000000 / new_period)
+        self._adapts += 1
+        period_log.record(self, new_period, load)
 
 
     ## This method resets the variables used for execution time profiling.
@@ -233,23 +700,74 @@ class Task:
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        self._misses = 0
+        self._missed = 0
+        self._overruns = 0
+        self._last_overrun = 0
+        self._alloc_runs = 0
+        self._alloc_sum = 0
+        self._events = 0
+        self._event_sum = 0
+        self._event_latest = 0
+        if self._prof:
+            for idx in range(HIST_BINS):
+                self._run_hist[idx] = 0
+                self._late_hist[idx] = 0
+
+
+    ## This method finds a percentile of the run durations or lateness from
+    #  the task's profiling histograms. Because the histogram bins have a
+    #  fixed width, the result is the upper edge of the bin in which the
+    #  percentile falls, limited to the largest time actually measured; if
+    #  it falls in the last bin, which has no upper edge, the largest time
+    #  measured is given.
+    #  @param pct The percentile to be found, for example 95
+    #  @param late @c True to use the lateness histogram or @c False to use
+    #         the run duration histogram
+    #  @return The percentile in microseconds, or zero if there's no data
+    def percentile(self, pct, late=False):
+        if not self._prof:
+            return 0
+        if late:
+            hist, width, top = self._late_hist, HIST_LATE_US, self._latest
+        else:
+            hist, width, top = self._run_hist, HIST_RUN_US, self._slowest
+        target = (sum(hist) * pct + 99) // 100
+        if target == 0:
+            return 0
+        count = 0
+        for idx in range(HIST_BINS):
+            count += hist[idx]
+            if count >= target:
+                break
+        if idx == HIST_BINS - 1:
+            return top
+        return min((idx + 1) * width, top)
 
 
     ## This method returns a string containing the task's transition trace.
-    #  The trace is a set of tuples, each of which contains a time and the
-    #  states from and to which the system transitioned. 
-    #  @return A possibly quite large string showing state transitions
+    #  The trace shows the most recent transitions kept in the ring buffer,
+    #  oldest first, each with its time in seconds before the trace was
+    #  taken and the states from and to which the system transitioned. If
+    #  older transitions have been overwritten, the first from-state is
+    #  shown as @c ?.
+    #  @return A string showing recent state transitions
     def get_trace(self):
         tr_str = 'Task ' + self.name + ':'
         if self._trace:
             tr_str += '\n'
-            last_state = 0
-            total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
-                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
+            now = utime.ticks_us()
+            size = len(self._tr_data) // 2
+            count = min(self._tr_count, size)
+            idx = (self._tr_idx - 2 * count) % len(self._tr_data)
+            last_state = ' 0' if self._tr_count <= size else ' ?'
+            for _ in range(count):
+                ago = utime.ticks_diff(self._tr_data[idx], now) / 1000000.0
+                state = self._tr_data[idx + 1]
+                tr_str += '{: 12.6f}: {:>2s} -> {:d}\n'.format(ago,
+                    last_state, state)
+                last_state = '{: 2d}'.format(state)
+                idx = (idx + 2) % len(self._tr_data)
         else:
             tr_str += ' not traced'
         return tr_str
@@ -257,8 +775,26 @@ class Task:
 
     ## Method to set a flag so that this task indicates that it's ready to run.
     #  This method may be called from an interrupt service routine or from
-    #  another task which has data that this task needs to process soon.
+    #  another task which has data that this task needs to process soon. It
+    #  is also called by a queue or share to which this task is bound when
+    #  data is put into it. If the task is profiled and has no period, the
+    #  time is noted so that the delay until the task runs is included in its
+    #  lateness. A timed task's lateness is measured from its releases only,
+    #  so that runs started by both aren't counted twice; the delay from the
+    #  first call since its last run is kept as its event latency instead.
+    #  A task with a deadline which wasn't already ready gets a new deadline
+    #  from now, so that @c TaskList.edf_sched() doesn't order it by the
+    #  deadline left over from its last release.
     def go(self):
+        if self._rel_deadline and not self.go_flag:
+            self._deadline = utime.ticks_add(utime.ticks_us(),
+                                             self._rel_deadline)
+        if self._prof:
+            if self.period is None:
+                if not self.go_flag:
+                    self._go_time = utime.ticks_us()
+            elif not self._event_time:
+                self._event_time = utime.ticks_us()
         self.go_flag = True
 
 
@@ -278,11 +814,179 @@ class Task:
             avg_dur = (self._run_sum / self._runs) / 1000.0
             avg_late = (self._late_sum / self._runs) / 1000.0
             rst += f"{avg_dur: 10.3f}{(self._slowest / 1000.0): 10.3f}"
-            if self.period != None:
-                rst += f"{avg_late: 10.3f}{(self._latest / 1000.0): 10.3f}"
+            rst += f"{avg_late: 10.3f}{(self._latest / 1000.0): 10.3f}"
+            if self._rel_deadline:
+                rst += f"{self._misses: 8d}"
+            else:
+                rst += '       -'
+        else:
+            rst += '         -         -         -         -       -'
+        if self.period:
+            rst += f"{self._missed: 8d}"
+        else:
+            rst += '       -'
+        if self._budget:
+            rst += f"{self._overruns: 10d}"
+        else:
+            rst += '         -'
+        if self._alloc_runs:
+            rst += f"{(self._alloc_sum / self._alloc_runs): 11.0f}"
+        else:
+            rst += '          -'
+        if self._max_period:
+            rst += f"{self._adapts: 8d}"
+        else:
+            rst += '       -'
         return rst
 
 
+# =============================================================================
+
+## Base class for objects which a task yields in order to wait.
+#
+#  When a task's generator yields a wait object rather than a state, the
+#  scheduler calls the object's @c arm() method and then parks the task,
+#  not running it again until @c done() returns @c True. A wait may have a
+#  timeout, after which it's over whether or not its condition has been met;
+#  its @c timed_out attribute then tells the task what happened. Child
+#  classes implement the condition in @c _met(), and may implement @c _arm()
+#  to note whatever the condition needs when the wait begins.
+class Wait:
+
+    ## Create a wait object.
+    #  @param timeout The longest time to wait in milliseconds, or @c None
+    #         to wait as long as it takes
+    def __init__(self, timeout=None):
+        self._timeout = int(timeout * 1000) if timeout != None else 0
+        self._until = 0
+
+        ## Set to @c True if the latest wait ended because of its timeout
+        self.timed_out = False
+
+
+    ## Change the timeout used by later waits, so that one wait object can
+    #  be reused for waits of different lengths without allocating memory.
+    #  @param timeout The longest time to wait in milliseconds, or @c None
+    #         to wait as long as it takes
+    def set_timeout(self, timeout):
+        self._timeout = int(timeout * 1000) if timeout != None else 0
+
+
+    ## Begin waiting. This is called by the scheduler when a task yields
+    #  this object.
+    def arm(self):
+        self.timed_out = False
+        if self._timeout:
+            self._until = utime.ticks_add(utime.ticks_us(), self._timeout)
+        self._arm()
+
+
+    ## Check whether the wait is over, either because the condition has been
+    #  met or because the timeout has run out.
+    #  @return @c True if the task which is waiting should run again
+    def done(self):
+        if self._met():
+            return True
+        if self._timeout and utime.ticks_diff(utime.ticks_us(),
+                                              self._until) >= 0:
+            self.timed_out = True
+            return True
+        return False
+
+
+    ## Note anything the condition needs when a wait begins.
+    def _arm(self):
+        pass
+
+
+    ## Check the condition for which the task waits.
+    #  @return @c True if the condition has been met
+    def _met(self):
+        return False
+
+
+## A wait which lasts for a given time. Unlike @c utime.sleep_ms(), other
+#  tasks run while the waiting task sleeps.
+#
+#  @b Example:
+#    @code
+#       def blink_fun ():
+#           nap = cotask.Sleep (500)
+#           while True:
+#               led.toggle ()
+#               yield nap
+#    @endcode
+class Sleep(Wait):
+
+    ## Create a sleep.
+    #  @param ms The time to sleep in milliseconds
+    def __init__(self, ms):
+        super().__init__(ms)
+
+
+    ## Check whether the sleep is over.
+    #  @return @c True if the sleep time has passed
+    def done(self):
+        return utime.ticks_diff(utime.ticks_us(), self._until) >= 0
+
+
+## A wait which lasts until a queue has something in it.
+class WaitQueue(Wait):
+
+    ## Create a wait for data in a queue.
+    #  @param queue The @c task_share.Queue which is to be watched
+    #  @param timeout The longest time to wait in milliseconds, or @c None
+    def __init__(self, queue, timeout=None):
+        super().__init__(timeout)
+        self._queue = queue
+
+
+    ## Check whether the queue holds any data.
+    #  @return @c True if there's something in the queue
+    def _met(self):
+        return self._queue.any()
+
+
+## A wait which lasts until a queue has room for another item.
+class WaitRoom(Wait):
+
+    ## Create a wait for room in a queue.
+    #  @param queue The @c task_share.Queue which is to be watched
+    #  @param timeout The longest time to wait in milliseconds, or @c None
+    def __init__(self, queue, timeout=None):
+        super().__init__(timeout)
+        self._queue = queue
+
+
+    ## Check whether the queue has room.
+    #  @return @c True if the queue isn't full
+    def _met(self):
+        return not self._queue.full()
+
+
+## A wait which lasts until the value in a share changes.
+class WaitChange(Wait):
+
+    ## Create a wait for a share to change.
+    #  @param share The @c task_share.Share which is to be watched
+    #  @param timeout The longest time to wait in milliseconds, or @c None
+    def __init__(self, share, timeout=None):
+        super().__init__(timeout)
+        self._share = share
+        self._value = None
+
+
+    ## Note the share's value when the wait begins.
+    def _arm(self):
+        self._value = self._share.get()
+
+
+    ## Check whether the share's value has changed.
+    #  @return @c True if the value differs from that when the wait began
+    def _met(self):
+        return self._share.get() != self._value
+
+
 # =============================================================================
 
 ## A list of tasks used internally by the task scheduler.
@@ -295,7 +999,12 @@ class Task:
 #  The task list is sorted by priority so that the scheduler can efficiently
 #  look through the list to find the highest priority task which is ready to
 #  run at any given time. Tasks can also be scheduled in a simpler
-#  "round-robin" fashion.
+#  "round-robin" fashion, or earliest-deadline-first with @c edf_sched().
+#
+#  Timed tasks are also kept in a deadline queue, a list sorted by each
+#  task's next run time. The @c dl_sched() scheduler uses it so that each
+#  pass only has to look at the earliest run time rather than asking every
+#  task whether it's ready.
 class TaskList:
 
     ## Initialize the task list. This creates the list of priorities in
@@ -308,6 +1017,74 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        # The deadline queue, a list of timed tasks sorted so that the task
+        # which is next due to run is first. Tasks which have been released
+        # but haven't run yet are taken out of the queue
+        self._timers = []
+
+        # Tasks parked by dl_sched() while they wait for something. They are
+        # kept out of the deadline queue until their waits are over
+        self._parked = []
+
+        ## A function which is called when a scheduler finds no task ready to
+        #  run, or @c None for no idle processing. The function is given the
+        #  time in microseconds until the next timed task is due, or @c None
+        #  if no task runs on a timer. It should return well before then;
+        #  @c idle_wait() is a hook which sleeps until the next interrupt.
+        self.idle_hook = None
+
+        # The idle time in each slot of the rolling load windows, a ring
+        # allocated by track_load(), or None if load isn't being tracked.
+        # Then the index of the current slot, the number of slots filled,
+        # the time the current slot ends, the idle time total when it began
+        # and the idle time over the short and long windows
+        self._load_ring = None
+        self._load_idx = 0
+        self._load_count = 0
+        self._load_end = 0
+        self._load_mark = 0
+        self._idle_short = 0
+        self._idle_long = 0
+
+        ## The free heap memory in bytes below which garbage is collected
+        #  when the CPU is idle, or @c None to leave collection to MicroPython
+        self.gc_free_min = None
+
+        # How long the latest collection in idle time took [us]
+        self._gc_us = 0
+
+        # The loads in thousandths above which adapt() stretches periods and
+        # below which it shrinks them, or zeros if periods aren't adapted
+        self._adapt_high = 0
+        self._adapt_low = 0
+
+        self.reset_idle()
+
+        # The watchdog fed when critical tasks are healthy, or None, and the
+        # length and end time in milliseconds of the current watchdog window
+        self._wdt = None
+        self._wd_window = 0
+        self._wd_end = 0
+
+        # The frame table made by build_frames(), a tuple holding a tuple of
+        # the timed tasks to run in each minor frame, or None if there isn't
+        # one. Then the minor frame length in microseconds, the index of the
+        # next frame, its start time or, with a frame timer, the time of the
+        # latest tick, and the number of frames which began a whole frame late
+        self._frames = None
+        self._frame_tasks = None
+        self._minor = 0
+        self._frame_idx = 0
+        self._frame_time = 0
+        self._frame_overruns = 0
+
+        # The timer which ticks at the start of each frame, or None if
+        # frame_sched() reads the clock, and counts of the ticks and of the
+        # frames run, each kept to 16 bits so the interrupt doesn't allocate
+        self._frame_timer = None
+        self._frame_ticks = 0
+        self._frames_run = 0
+
 
     ## Append a task to the task list. The list will be sorted by task 
     #  priorities so that the scheduler can quickly find the highest priority
@@ -333,6 +1110,98 @@ class TaskList:
         # Make sure the main list (of lists at each priority) is sorted
         self.pri_list.sort(key=lambda pri: pri[0], reverse=True)
 
+        # Timed tasks also go into the deadline queue, unless they're released
+        # by a hardware timer
+        task._tasks = self
+        if task.period != None and task._timer is None:
+            self._queue_timer(task)
+
+        # If load is being tracked, the task needs a ring for its run times
+        if self._load_ring is not None and task._load_ring is None:
+            task._load_ring = array.array('L', [0] * LOAD_SLOTS)
+            task._set_flags()
+
+
+    ## Put a timed task into the deadline queue after any tasks which are due
+    #  to run at or before the same time. Times are compared with
+    #  @c utime.ticks_diff() so the queue stays in order when the timer wraps.
+    #  @param task The task to be put into the queue
+    def _queue_timer(self, task):
+        timers = self._timers
+        next_run = task._next_run
+        idx = len(timers)
+        while idx > 0 and utime.ticks_diff(timers[idx - 1]._next_run,
+                                           next_run) > 0:
+            idx -= 1
+        timers.insert(idx, task)
+        task._queued = True
+
+
+    ## Take a task whose period has changed out of the deadline queue and, if
+    #  it's still polled, put it back in its new place. A task which has been
+    #  released or is parked isn't in the queue; it's put back after its next
+    #  run as usual.
+    #  @param task The task whose period has changed
+    def _requeue(self, task):
+        if task._queued:
+            self._timers.remove(task)
+            task._queued = False
+        if task._flags & _F_POLL and not task.go_flag and task._wait is None:
+            self._queue_timer(task)
+
+
+    ## Set up a hardware watchdog which is fed only while the critical tasks
+    #  are healthy. At the end of each window, the watchdog is fed if every
+    #  task created with <tt>critical=True</tt> has run during the window
+    #  without missing a deadline or going over its time budget. Otherwise
+    #  it's left alone, and if that goes on for longer than the watchdog's
+    #  timeout the microcontroller is reset. The window must be a good deal
+    #  shorter than the watchdog's timeout.
+    #
+    #  @b Example:
+    #    @code
+    #       from machine import WDT
+    #       task_list.set_watchdog(WDT(timeout=500), 100)
+    #    @endcode
+    #  @param wdt A watchdog object with a @c feed() method, such as a
+    #         @c machine.WDT, or @c None to stop feeding it
+    #  @param window_ms The length of each window in milliseconds
+    def set_watchdog(self, wdt, window_ms):
+        self._wdt = wdt
+        self._wd_window = int(window_ms)
+        self._wd_end = utime.ticks_add(utime.ticks_ms(), self._wd_window)
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                task._wd_runs = task._runs
+                task._wd_faults = task._misses + task._overruns
+
+
+    ## At the end of each watchdog window, feed the watchdog if every critical
+    #  task has been healthy during the window. This is called by the
+    #  schedulers at the start of each pass when a watchdog has been set up.
+    def _watch(self):
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._wd_end) < 0:
+            return
+        self._wd_end = utime.ticks_add(now, self._wd_window)
+
+        healthy = True
+        for pri in self.pri_list:
+            num = 2
+            length = len(pri)
+            while num < length:
+                task = pri[num]
+                num += 1
+                if task.critical:
+                    faults = task._misses + task._overruns
+                    if task._runs == task._wd_runs \
+                            or faults != task._wd_faults:
+                        healthy = False
+                    task._wd_runs = task._runs
+                    task._wd_faults = faults
+        if healthy:
+            self._wdt.feed()
+
 
     ## Run tasks in order, ignoring the tasks' priorities.
     #
@@ -342,13 +1211,34 @@ class TaskList:
     #  tasks first, that has no significant effect in the long run, as all the
     #  tasks are given a chance to run each time through the list, and it takes
     #  about the same amount of time before each is given a chance to run 
-    #  again.
+    #  again. The watchdog, load windows and idle time are kept as they are
+    #  by the other schedulers.
     @micropython.native
     def rr_sched(self):
-        # For each priority level, run all tasks at that level
+        if self._wdt is not None:
+            self._watch()
+        if self._load_ring is not None:
+            self._roll_load()
+
+        # For each priority level, run all tasks at that level. The clock is
+        # read once for the pass rather than once for each task
+        now = utime.ticks_us()
+        ran = False
         for pri in self.pri_list:
-            for task in pri[2:]:
-                task.schedule()
+            num = 2
+            length = len(pri)
+            while num < length:
+                task = pri[num]
+                num += 1
+                if task._poll(now):
+                    task._run()
+                    ran = True
+
+        # If nothing was ready to run, the CPU is idle
+        if ran:
+            self._idle_mark = None
+        else:
+            self._idle()
 
 
     ## Run tasks according to their priorities.
@@ -358,7 +1248,14 @@ class TaskList:
     #  calls that task's @c run() method.
     @micropython.native
     def pri_sched(self):
-        # Go down the list of priorities, beginning with the highest
+        if self._wdt is not None:
+            self._watch()
+        if self._load_ring is not None:
+            self._roll_load()
+
+        # Go down the list of priorities, beginning with the highest. Every
+        # task is checked against the same clock reading
+        now = utime.ticks_us()
         for pri in self.pri_list:
             # Within each priority list, run tasks in round-robin order
             # Each priority list is [priority, index, task, task, ...] where
@@ -366,30 +1263,912 @@ class TaskList:
             tries = 2
             length = len(pri)
             while tries < length:
-                ran = pri[pri[1]].schedule()
+                task = pri[pri[1]]
+                tries += 1
+                pri[1] += 1
+                if pri[1] >= length:
+                    pri[1] = 2
+                if task._poll(now):
+                    task._run()
+                    self._idle_mark = None
+                    return
+
+        # Nothing was ready to run, so the CPU is idle
+        self._idle()
+
+
+    ## Run tasks according to their priorities, using the deadline queue.
+    #
+    #  This scheduler chooses the same task as @c pri_sched(), the highest
+    #  priority task which is ready with round-robin order among tasks of
+    #  equal priority, but it doesn't poll each task's timer. Instead it
+    #  releases the timed tasks at the front of the deadline queue whose run
+    #  times have come, then runs the first task whose go flag is set. A
+    #  pass in which nothing is due costs one clock reading no matter how
+    #  many tasks there are.
+    @micropython.native
+    def dl_sched(self):
+        if self._wdt is not None:
+            self._watch()
+        if self._load_ring is not None:
+            self._roll_load()
+
+        # Release each timed task whose run time has come. A released task
+        # leaves the deadline queue until it has run
+        timers = self._timers
+        if timers:
+            now = utime.ticks_us()
+            while timers and utime.ticks_diff(now, timers[0]._next_run) > 0:
+                task = timers.pop(0)
+                task._queued = False
+                task._release(now)
+
+        # Wake up any parked tasks whose waits are over
+        parked = self._parked
+        idx = len(parked)
+        while idx > 0:
+            idx -= 1
+            if parked[idx]._wait.done():
+                parked.pop(idx)._wake()
+
+        # Go down the list of priorities, beginning with the highest, and run
+        # the first task found with its go flag set
+        for pri in self.pri_list:
+            tries = 2
+            length = len(pri)
+            while tries < length:
+                task = pri[pri[1]]
                 tries += 1
                 pri[1] += 1
                 if pri[1] >= length:
                     pri[1] = 2
-                if ran:
+                if task.go_flag and task._wait is None:
+                    task._run()
+                    self._idle_mark = None
+
+                    # If the task has parked itself, take it out of the
+                    # deadline queue until it wakes up; otherwise put a timed
+                    # task back in line for its next run
+                    if task._wait is not None:
+                        if task._queued:
+                            self._timers.remove(task)
+                            task._queued = False
+                        parked.append(task)
+                    elif task._flags & _F_POLL and not task._queued:
+                        self._queue_timer(task)
                     return
 
+        # Nothing was ready to run, so the CPU is idle
+        self._idle(True)
+
+
+    ## Run the ready task whose deadline is soonest.
+    #
+    #  This scheduler implements an earliest-deadline-first policy. Each time
+    #  it is called, it checks every task and runs the ready task with the
+    #  nearest absolute deadline, no matter what its priority is. Tasks
+    #  without deadlines, such as those triggered by @c go() or having a
+    #  period of zero, run only when no task with a deadline is ready; among
+    #  them the highest priority wins, with round-robin order at each
+    #  priority as in @c pri_sched(). Deadline misses are counted for each
+    #  profiled task and shown in the task table so that this policy can be
+    #  compared with @c pri_sched() on the same set of tasks.
+    @micropython.native
+    def edf_sched(self):
+        if self._wdt is not None:
+            self._watch()
+        if self._load_ring is not None:
+            self._roll_load()
+
+        best = None
+        best_deadline = 0
+        bg_task = None
+        bg_pri = None
+        bg_next = 2
+        now = utime.ticks_us()
+
+        for pri in self.pri_list:
+            length = len(pri)
+            idx = pri[1]
+            tries = 2
+            while tries < length:
+                task = pri[idx]
+                tries += 1
+                idx += 1
+                if idx >= length:
+                    idx = 2
+
+                # A task which was released but hasn't run yet keeps its
+                # go flag, so don't ask its timer again
+                if task.go_flag and task._wait is None or task._poll(now):
+                    if task._rel_deadline:
+                        if best is None or utime.ticks_diff(
+                                task._deadline, best_deadline) < 0:
+                            best = task
+                            best_deadline = task._deadline
+                    elif bg_task is None:
+                        bg_task = task
+                        bg_pri = pri
+                        bg_next = idx
+
+        if best is not None:
+            best._run()
+        elif bg_task is not None:
+            bg_pri[1] = bg_next
+            bg_task._run()
+        else:
+            self._idle()
+            return
+        self._idle_mark = None
+
+
+    ## Build the static frame table used by @c frame_sched().
+    #
+    #  The minor frame is the greatest common divisor of the timed tasks'
+    #  periods and the major frame is their least common multiple, so the
+    #  harmonic periods of 10, 20 and 200 ms make 20 frames of 10 ms. Each
+    #  timed task goes in every frame a period apart, starting in the frame
+    #  which evens out the load best, using measured run times if the tasks
+    #  have been profiled. In each frame, tasks run in order of priority.
+    #  Tasks released by hardware timers are left out and run in the slack.
+    #  Call this after all the tasks have been appended, and again after
+    #  changing a period with @c set_period(); periods changed by
+    #  @c adapt() are put in the table as they change.
+    #  @param minor_ms The length of the minor frame in milliseconds. By
+    #         default it's the longest which divides all the periods
+    #  @param timer The number of a hardware timer to tick at the start of
+    #         each frame, or @c None to find the frame times from the clock
+    def build_frames(self, minor_ms=None, timer=None):
+        tasks = [task for pri in self.pri_list for task in pri[2:]
+                 if task.period and task._timer is None]
+        if not tasks:
+            raise ValueError("There are no timed tasks to put in frames")
+
+        minor = 0
+        for task in tasks:
+            minor = _gcd(minor, task.period)
+        if minor_ms is not None:
+            minor = int(minor_ms * 1000)
+        self._fill_frames(tasks, minor)
+        self._frame_tasks = tasks
+        self._frame_idx = 0
+        self._frame_overruns = 0
+
+        if self._frame_timer is not None:
+            self._frame_timer.deinit()
+            self._frame_timer = None
+        self._frame_ticks = 0
+        self._frames_run = 0
+        self._frame_time = utime.ticks_add(utime.ticks_us(), minor)
+        if timer is not None:
+            from pyb import Timer
+            self._frame_timer = Timer(timer, freq=1000000 / minor,
+                                      callback=self._frame_tick)
+
+
+    ## Fill the frame table with the given timed tasks, placing each in the
+    #  frames which suit its current period. This is used by
+    #  @c build_frames() and by @c adapt() after it changes periods. If the
+    #  tasks don't fit in a table, it's left as it was.
+    #  @param tasks The timed tasks to put in the table
+    #  @param minor The length of the minor frame in microseconds
+    def _fill_frames(self, tasks, minor):
+        for task in tasks:
+            if task.period % minor:
+                raise ValueError(task.name + " period isn't a multiple "
+                                 "of the minor frame")
+        major = minor
+        for task in tasks:
+            major = major * task.period // _gcd(major, task.period)
+        count = major // minor
+        if count > FRAMES_MAX:
+            raise ValueError("The frame table would have " + str(count)
+                             + " frames; the periods should be harmonic")
+
+        # Place the most frequent tasks first, each at the offset which
+        # leaves its busiest frame least loaded
+        frames = [[] for _ in range(count)]
+        load = [0] * count
+        tasks.sort(key=lambda task: task.period)
+        for task in tasks:
+            step = task.period // minor
+            cost = max(task._slowest, task._budget, 1)
+            best = min(range(step), key=lambda off: max(load[off::step]))
+            for idx in range(best, count, step):
+                frames[idx].append(task)
+                load[idx] += cost
+        for frame in frames:
+            frame.sort(key=lambda task: task.priority, reverse=True)
+        self._frames = tuple(tuple(frame) for frame in frames)
+        self._minor = minor
+        for pri in self.pri_list:
+            for idx in range(2, len(pri)):
+                pri[idx]._framed = False
+        for task in tasks:
+            task._framed = True
+
+
+    ## Timer callback which marks the start of a frame. It runs in an
+    #  interrupt, so it only counts the tick and notes its time, which keeps
+    #  the frames' start times in step with the timer.
+    #  @param timer The timer which caused the interrupt
+    def _frame_tick(self, timer):
+        self._frame_time = utime.ticks_us()
+        self._frame_ticks = (self._frame_ticks + 1) & 0xFFFF
+
+
+    ## Run tasks from a static frame table, as a cyclic executive does.
+    #
+    #  When a minor frame begins, this scheduler runs all the timed tasks in
+    #  that frame of the table made by @c build_frames(), one after another
+    #  in a fixed order, without asking any task whether it's ready. Between
+    #  frames, the slack goes to tasks whose go flags have been set, chosen
+    #  by priority and in round-robin order as in @c pri_sched(). A frame
+    #  task which has parked itself is passed over until its wait is over.
+    #  Timed tasks which aren't in the table, such as those appended after
+    #  it was built, are released in the slack when their time comes, as
+    #  @c pri_sched() would. A frame which begins a whole frame late,
+    #  because the one before it ran over, is counted as a frame overrun.
+    @micropython.native
+    def frame_sched(self):
+        if self._wdt is not None:
+            self._watch()
+        if self._load_ring is not None:
+            self._roll_load()
+
+        now = utime.ticks_us()
+        if self._frame_timer is None:
+            due = utime.ticks_diff(now, self._frame_time) >= 0
+        else:
+            due = self._frame_ticks != self._frames_run
+        if due:
+            self._run_frame()
+            self._idle_mark = None
+            return
+
+        # Fill the slack with tasks which have been triggered or, if they're
+        # timed but not in the table, whose time has come
+        for pri in self.pri_list:
+            tries = 2
+            length = len(pri)
+            while tries < length:
+                task = pri[pri[1]]
+                tries += 1
+                pri[1] += 1
+                if pri[1] >= length:
+                    pri[1] = 2
+                if not task._framed:
+                    if task._poll(now):
+                        task._run()
+                        self._idle_mark = None
+                        return
+                    continue
+                wait = task._wait
+                if wait is not None:
+                    if not wait.done():
+                        continue
+                    task._wake()
+                if task.go_flag:
+                    task._run()
+                    self._idle_mark = None
+                    return
+
+        # Nothing was ready to run, so the CPU is idle
+        self._idle()
+
+
+    ## Run the tasks in the next frame of the frame table. Each task is
+    #  released as of the frame's start time, so its lateness shows how far
+    #  into the frame it began.
+    @micropython.native
+    def _run_frame(self):
+        if self._frame_timer is None:
+            start = self._frame_time
+            self._frame_time = utime.ticks_add(start, self._minor)
+            if utime.ticks_diff(utime.ticks_us(), self._frame_time) >= 0:
+                self._frame_overruns += 1
+        else:
+            # The frame started at its tick, which is the latest one less a
+            # frame for each tick still waiting. The count and time are read
+            # again if a tick came in between
+            ticks = self._frame_ticks
+            start = self._frame_time
+            while ticks != self._frame_ticks:
+                ticks = self._frame_ticks
+                start = self._frame_time
+            behind = (ticks - self._frames_run - 1) & 0xFFFF
+            start = utime.ticks_add(start, -behind * self._minor)
+            self._frames_run = (self._frames_run + 1) & 0xFFFF
+            if behind:
+                self._frame_overruns += 1
+
+        idx = self._frame_idx
+        for task in self._frames[idx]:
+            wait = task._wait
+            if wait is not None:
+                if not wait.done():
+                    continue
+                task._wake()
+            task._next_run = start
+            task._release(utime.ticks_us())
+            task._run()
+        idx += 1
+        if idx >= len(self._frames):
+            idx = 0
+        self._frame_idx = idx
+
+
+    ## Start keeping rolling load figures over the last second and the last
+    #  ten seconds. Rings holding the run time of each task and the idle
+    #  time in each @c LOAD_SLOT_MS slot are allocated here, so keeping and
+    #  reading the figures while the tasks run doesn't allocate memory. The
+    #  figures are found with @c load() and @c idle().
+    def track_load(self):
+        self._load_ring = array.array('L', [0] * LOAD_SLOTS)
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task._load_ring is None:
+                    task._load_ring = array.array('L', [0] * LOAD_SLOTS)
+                    task._set_flags()
+                task._slot_busy = 0
+        self._load_idx = 0
+        self._load_count = 0
+        self._load_end = utime.ticks_add(utime.ticks_ms(), LOAD_SLOT_MS)
+        self._load_mark = self._idle_sum
+        self._idle_short = 0
+        self._idle_long = 0
+
+
+    ## Adapt the periods of tasks to the load while they run. When the CPU
+    #  is overloaded, the periods of tasks given a @c max_period which
+    #  aren't critical are stretched, leaving more time for the critical
+    #  ones, and when there's headroom again they're shrunk back, to no less
+    #  than their @c min_period. The load is measured by the load windows,
+    #  which are started here if @c track_load() hasn't been called.
+    #  @param high The load in thousandths over the last second above which
+    #         periods are stretched, or @c None to stop adapting periods
+    #  @param low The load in thousandths below which periods are shrunk
+    def adapt(self, high=ADAPT_HIGH, low=ADAPT_LOW):
+        if high is None:
+            self._adapt_high = 0
+            self._adapt_low = 0
+            return
+        if self._load_ring is None:
+            self.track_load()
+        self._adapt_high = int(high)
+        self._adapt_low = int(low)
+
+
+    ## Move the load windows on by a slot whenever a slot has ended. The
+    #  totals over each window are kept up to date by adding the newest
+    #  slot and taking away the one which has just left the window.
+    @micropython.native
+    def _roll_load(self):
+        now = utime.ticks_ms()
+        while utime.ticks_diff(now, self._load_end) >= 0:
+            self._load_end = utime.ticks_add(self._load_end, LOAD_SLOT_MS)
+            idx = self._load_idx
+            old = idx - LOAD_SHORT
+            if old < 0:
+                old += LOAD_SLOTS
+
+            idle = self._idle_sum - self._load_mark
+            self._load_mark = self._idle_sum
+            ring = self._load_ring
+            self._idle_long += idle - ring[idx]
+            self._idle_short += idle - ring[old]
+            ring[idx] = idle
+
+            for pri in self.pri_list:
+                num = 2
+                length = len(pri)
+                while num < length:
+                    task = pri[num]
+                    num += 1
+                    ring = task._load_ring
+                    busy = task._slot_busy
+                    task._slot_busy = 0
+                    task._busy_long += busy - ring[idx]
+                    task._busy_short += busy - ring[old]
+                    ring[idx] = busy
+
+            idx += 1
+            if idx >= LOAD_SLOTS:
+                idx = 0
+            self._load_idx = idx
+            if self._load_count < LOAD_SLOTS:
+                self._load_count += 1
+
+            # Once each second, see whether periods should be adapted to the
+            # load over that second
+            if self._adapt_high and idx % LOAD_SHORT == 0 \
+                    and self._load_count >= LOAD_SHORT:
+                self._adapt()
+
+
+    ## Adapt the periods of tasks to the load. Periods of adaptive tasks
+    #  which aren't critical are stretched when the load over the last
+    #  second is above the high limit given to @c adapt() and shrunk back
+    #  when it's below the low limit, one step each second and no further
+    #  than each task's own limits. Each change is logged in @c period_log.
+    #
+    #  Between limits, a step changes a period by @c 1/ADAPT_STEP of itself.
+    #  When a frame table is in use, periods are doubled or halved instead
+    #  so that they stay harmonic, and the table is rebuilt; a change which
+    #  wouldn't fit in a table is undone. A period isn't shrunk if the load
+    #  the task would then add, found from its share of the last second,
+    #  would take the total over the high limit.
+    #
+    #  This runs in the scheduler, so it doesn't allocate memory, except
+    #  that a frame table is rebuilt, as @c build_frames() builds it, when
+    #  a period in it has changed.
+    @micropython.native
+    def _adapt(self):
+        load = 1000 - self.idle()
+        if load > self._adapt_high:
+            stretch = True
+        elif load < self._adapt_low:
+            stretch = False
+        else:
+            return
+
+        changed = 0
+        added = 0
+        frames = self._frames is not None
+        for pri in self.pri_list:
+            num = 2
+            length = len(pri)
+            while num < length:
+                task = pri[num]
+                num += 1
+                task._old_period = 0
+                if task.critical or not task._max_period:
+                    continue
+                period = task.period
+                if frames:
+                    new = period * 2 if stretch else period // 2
+                    if new > task._max_period or new < task._min_period \
+                            or new % self._minor:
+                        continue
+                elif stretch:
+                    new = min(period + period // ADAPT_STEP,
+                              task._max_period)
+                else:
+                    new = max(period * ADAPT_STEP // (ADAPT_STEP + 1),
+                              task._min_period)
+                if new == period:
+                    continue
+
+                # Don't shrink a period if the task's extra runs would push
+                # the load back over the high limit, or the period would
+                # only be stretched again
+                if not stretch:
+                    more = self.load(task) * (period - new) // new
+                    if load + added + more > self._adapt_high:
+                        continue
+                    added += more
+                task._old_period = period
+                task._change_period(new, load)
+                changed += 1
+
+        if changed and frames:
+            try:
+                self._fill_frames(self._frame_tasks, self._minor)
+            except ValueError:
+                for pri in self.pri_list:
+                    num = 2
+                    length = len(pri)
+                    while num < length:
+                        task = pri[num]
+                        num += 1
+                        if task._old_period:
+                            task._change_period(task._old_period, load)
+            self._frame_idx %= len(self._frames)
+
+
+    ## Find the length in milliseconds of the part of a load window which
+    #  has been filled so far.
+    #  @param long @c True for the long window or @c False for the short one
+    def _window_ms(self, long):
+        count = self._load_count
+        if not long and count > LOAD_SHORT:
+            count = LOAD_SHORT
+        return count * LOAD_SLOT_MS
+
+
+    ## Find the load over the last second or ten seconds, as the part of
+    #  the time taken by one task, or by everything but idling if no task is
+    #  given. The result is an integer in thousandths so that reading it
+    #  doesn't allocate memory, as reading a float would.
+    #  @param task A task in this list, or @c None for the whole system
+    #  @param long @c True for the last ten seconds or @c False for the
+    #         last second
+    #  @return The load in thousandths, or zero before the first slot ends
+    def load(self, task=None, long=False):
+        window = self._window_ms(long)
+        if window == 0 or self._load_ring is None:
+            return 0
+        if task is None:
+            return 1000 - self.idle(long)
+        busy = task._busy_long if long else task._busy_short
+        return busy // window
+
+
+    ## Find the part of the last second or ten seconds in which the CPU was
+    #  idle, in thousandths.
+    #  @param long @c True for the last ten seconds or @c False for the
+    #         last second
+    #  @return The idle time in thousandths, or 1000 before the first slot
+    #          ends
+    def idle(self, long=False):
+        window = self._window_ms(long)
+        if window == 0 or self._load_ring is None:
+            return 1000
+        return (self._idle_long if long else self._idle_short) // window
+
+
+    ## Find how long it will be until the next timed task is due to run.
+    #  @param now The current time from @c utime.ticks_us(), if known
+    #  @return The time in microseconds until the soonest task is due, zero if
+    #          a task is ready now, or @c None if no task runs on a timer
+    def time_to_next(self, now=None):
+        if now is None:
+            now = utime.ticks_us()
+        soonest = None
+        for pri in self.pri_list:
+            num = 2
+            length = len(pri)
+            while num < length:
+                task = pri[num]
+                num += 1
+                if task._wait is not None:
+                    continue
+                if task.go_flag:
+                    return 0
+                if task.period is not None:
+                    wait = utime.ticks_diff(task._next_run, now)
+                    if soonest is None or wait < soonest:
+                        soonest = wait
+        if soonest is not None and soonest < 0:
+            soonest = 0
+        return soonest
+
+
+    ## Account for idle time and call the idle hook. This is called by the
+    #  schedulers during each pass in which no task was ready to run. Time
+    #  between consecutive idle passes is counted as idle as well as the
+    #  time spent in the idle hook, so the idle time is measured correctly
+    #  whether or not there is a hook.
+    #  @param queued @c True if called by @c dl_sched(), which keeps the
+    #         deadline queue in order; the other schedulers don't use it
+    def _idle(self, queued=False):
+        now = utime.ticks_us()
+        if self._idle_mark is not None:
+            self._idle_sum += utime.ticks_diff(now, self._idle_mark)
+            self._fold_idle()
+
+        # Find the time until the next task is due once for the pass, and
+        # only if it's needed. Under dl_sched(), the deadline queue has the
+        # next polled task first; otherwise every task is checked
+        low = self.gc_free_min is not None \
+            and gc.mem_free() < self.gc_free_min
+        if not low and self.idle_hook is None:
+            self._idle_mark = now
+            return
+        timers = self._timers
+        if queued and timers:
+            wait = utime.ticks_diff(timers[0]._next_run, now)
+            if wait < 0:
+                wait = 0
+        else:
+            wait = self.time_to_next(now)
+
+        # If free memory is low, collect garbage now rather than letting the
+        # collector run in the middle of a task, as long as the collection
+        # should be over before the next task is due. It isn't idle time
+        if low and (wait is None or wait > self._gc_us):
+            gc.collect()
+            end = utime.ticks_us()
+            self._gc_us = utime.ticks_diff(end, now)
+            gc_log.record(None, end, self._gc_us)
+            now = end
+            if wait is not None:
+                wait = max(wait - self._gc_us, 0)
+        if self.idle_hook is not None:
+            self.idle_hook(wait)
+            end = utime.ticks_us()
+            self._idle_sum += utime.ticks_diff(end, now)
+            self._fold_idle()
+            now = end
+        self._idle_mark = now
+
+
+    ## Move whole seconds of idle time from @c _idle_sum to @c _idle_s, so
+    #  that the microsecond total stays a small integer and adding to it
+    #  never allocates memory, however long the tasks run.
+    def _fold_idle(self):
+        while self._idle_sum >= 1000000:
+            self._idle_sum -= 1000000
+            self._load_mark -= 1000000
+            self._idle_s += 1
+
+
+    ## Reset the idle time accounting. This method is also used by
+    #  @c __init__() to create the variables.
+    def reset_idle(self):
+        self._idle_sum = 0
+        self._idle_s = 0
+        self._idle_mark = None
+        self._idle_start = utime.ticks_ms()
+        self._load_mark = 0
+
+
+    ## Find the percentage of time during which no task was running since
+    #  the task list was created or @c reset_idle() was called.
+    #  @return The idle time as a percentage of the elapsed time
+    def idle_percent(self):
+        elapsed = utime.ticks_diff(utime.ticks_ms(), self._idle_start)
+        if elapsed <= 0:
+            return 0.0
+        return (self._idle_s * 1000000 + self._idle_sum) / (elapsed * 10.0)
+
+
+    ## Get the transition traces of all the tasks in the list. This may be
+    #  called after a crash or stall to see what each task did last.
+    #  @return A string holding each task's trace
+    def get_trace(self):
+        return '\n'.join(task.get_trace() for pri in self.pri_list
+                         for task in pri[2:])
+
+
+    ## Write the profiling histograms of all profiled tasks to a stream such
+    #  as a @c USB_VCP or file in a compact binary form. The dump begins with
+    #  the bytes @c CTH1 and a header <tt>struct.pack('<HHHH', tasks, bins,
+    #  run bin width, lateness bin width)</tt>. Then for each profiled task
+    #  there's its name padded to 16 bytes, followed by the run duration and
+    #  lateness histograms as little-endian unsigned 32 bit counts.
+    #  @param stream An object with a @c write() method which takes bytes
+    def dump_hist(self, stream):
+        tasks = [task for pri in self.pri_list for task in pri[2:]
+                 if task._prof]
+        stream.write(b'CTH1')
+        stream.write(struct.pack('<HHHH', len(tasks), HIST_BINS,
+                                 HIST_RUN_US, HIST_LATE_US))
+        for task in tasks:
+            stream.write(struct.pack('16s', task.name.encode()))
+            stream.write(task._run_hist)
+            stream.write(task._late_hist)
+
+
+    ## Write the measured run times, periods, priorities and deadlines of
+    #  the tasks to a stream as text which @c sched_analysis.py can read on
+    #  a computer, so that other periods and priorities can be tried there.
+    #  @param stream An object with a @c write() method which takes strings
+    def dump_profile(self, stream):
+        import sched_analysis
+        sched_analysis.write_profile(sched_analysis.from_task_list(self),
+                                     stream)
+
+
+    ## Check whether the tasks can meet their deadlines, using the longest
+    #  run times measured so far. See @c sched_analysis.py for the method.
+    #  @param overhead_us The scheduler's time per task run in microseconds
+    #  @return A table of each task's worst case response time, with the
+    #          CPU utilization and any tasks which may miss deadlines
+    def analyze(self, overhead_us=0):
+        import sched_analysis
+        return sched_analysis.report(sched_analysis.from_task_list(self),
+                                     overhead_us)
+
 
     ## Create some diagnostic text showing the tasks in the task list.
     def __repr__(self):
         ret_str = 'TASK             PRI    PERIOD    RUNS   AVG DUR   MAX ' \
-            'DUR  AVG LATE  MAX LATE\n'
+            'DUR  AVG LATE  MAX LATE  MISSES  MISSED  OVERRUNS  ALLOC/RUN  ADAPTS\n'
         for pri in self.pri_list:
             for task in pri[2:]:
                 ret_str += str(task) + '\n'
+        ret_str += f"IDLE {self.idle_percent():.1f}% of " \
+            f"{utime.ticks_diff(utime.ticks_ms(), self._idle_start) / 1000.0:.1f} s\n"
+        if self._load_count:
+            ret_str += f"LOAD {self.load() / 10.0:.1f}% over 1 s, " \
+                f"{self.load(long=True) / 10.0:.1f}% over 10 s\n"
+        if self._frames is not None:
+            ret_str += f"FRAMES {len(self._frames)} x " \
+                f"{self._minor / 1000.0:.1f} ms, " \
+                f"{self._frame_overruns} overruns\n"
+
+        # Percentiles from the profiling histograms, in milliseconds
+        ret_str += '\nTASK               DUR P50   DUR P95   DUR P99  LATE P50' \
+            '  LATE P95  LATE P99\n'
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task._prof and task._runs > 0:
+                    ret_str += f"{task.name:<16s}"
+                    for late in (False, True):
+                        for pct in (50, 95, 99):
+                            ret_str += \
+                                f"{task.percentile(pct, late) / 1000.0: 10.3f}"
+                    ret_str += '\n'
+
+        # Delay from go() to the next run of timed tasks, in milliseconds
+        header = '\nTASK                EVENTS   EVT AVG   EVT MAX\n'
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task._events:
+                    ret_str += header + f"{task.name:<16s}" \
+                        f"{task._events: 10d}" \
+                        f"{task._event_sum / task._events / 1000.0: 10.3f}" \
+                        f"{task._event_latest / 1000.0: 10.3f}\n"
+                    header = ''
+
+        # Rolling load of each task, in percent
+        if self._load_count:
+            ret_str += '\nTASK              LOAD 1 S  LOAD 10 S\n'
+            for pri in self.pri_list:
+                for task in pri[2:]:
+                    ret_str += f"{task.name:<16s}" \
+                        f"{self.load(task) / 10.0: 10.1f}" \
+                        f"{self.load(task, True) / 10.0: 11.1f}\n"
 
         return ret_str
 
 
+## A log of garbage collections which paused the tasks.
+#
+#  Collections are found by tasks created with @c alloc=True, whose heap
+#  usage drops during a run in which the collector ran, and are made by
+#  @c TaskList when it collects in idle time. The log is a ring buffer
+#  allocated here, holding the latest @c GC_LOG_LEN collections with the
+#  time of each, its duration and the task which was running. For a
+#  collection during a run, the duration is that of the whole run, which
+#  is as close as the time of the collection itself can be measured.
+class GCLog:
+
+    ## Create an empty log.
+    #  @param length The number of collections to keep
+    def __init__(self, length=GC_LOG_LEN):
+        self._times = array.array('l', [0] * length)
+        self._durations = array.array('l', [0] * length)
+        self._tasks = [None] * length
+        self.reset()
+
+
+    ## Forget the collections logged so far.
+    def reset(self):
+        self._idx = 0
+
+        ## The number of collections logged since the log was reset
+        self.count = 0
+
+        ## The longest pause logged since the log was reset [us]
+        self.longest = 0
+
+
+    ## Log a collection, overwriting the oldest one if the log is full.
+    #  @param task The task which was running, or @c None for idle time
+    #  @param time The time at which the collection ended from
+    #         @c utime.ticks_us()
+    #  @param duration How long the collection paused things [us]
+    def record(self, task, time, duration):
+        idx = self._idx
+        self._times[idx] = time
+        self._durations[idx] = duration
+        self._tasks[idx] = task
+        idx += 1
+        if idx >= len(self._times):
+            idx = 0
+        self._idx = idx
+        self.count += 1
+        if duration > self.longest:
+            self.longest = duration
+
+
+    ## Show the logged collections, oldest first, each with its time in
+    #  seconds before now, its duration in milliseconds and the task which
+    #  was running.
+    def __repr__(self):
+        ret_str = f"GC PAUSES {self.count}, longest " \
+            f"{self.longest / 1000.0:.3f} ms\n"
+        now = utime.ticks_us()
+        size = len(self._times)
+        count = min(self.count, size)
+        idx = (self._idx - count) % size
+        for _ in range(count):
+            task = self._tasks[idx]
+            ret_str += '{: 12.6f}{: 10.3f}  {:s}\n'.format(
+                utime.ticks_diff(self._times[idx], now) / 1000000.0,
+                self._durations[idx] / 1000.0,
+                'idle' if task is None else task.name)
+            idx = (idx + 1) % size
+        return ret_str
+
+
+## A log of the period changes made by @c TaskList.adapt().
+#
+#  The log is a ring buffer allocated here, holding the latest
+#  @c PERIOD_LOG_LEN changes with the time of each, the task, its new period
+#  and the load which led to the change.
+class PeriodLog:
+
+    ## Create an empty log.
+    #  @param length The number of changes to keep
+    def __init__(self, length=PERIOD_LOG_LEN):
+        self._times = array.array('l', [0] * length)
+        self._periods = array.array('l', [0] * length)
+        self._loads = array.array('l', [0] * length)
+        self._tasks = [None] * length
+        self.reset()
+
+
+    ## Forget the changes logged so far.
+    def reset(self):
+        self._idx = 0
+
+        ## The number of changes logged since the log was reset
+        self.count = 0
+
+
+    ## Log a change, overwriting the oldest one if the log is full.
+    #  @param task The task whose period was changed
+    #  @param period The new period in microseconds
+    #  @param load The load over the last second in thousandths
+    def record(self, task, period, load):
+        idx = self._idx
+        self._times[idx] = utime.ticks_us()
+        self._periods[idx] = period
+        self._loads[idx] = load
+        self._tasks[idx] = task
+        idx += 1
+        if idx >= len(self._times):
+            idx = 0
+        self._idx = idx
+        self.count += 1
+
+
+    ## Show the logged changes, oldest first, each with its time in seconds
+    #  before now, the new period in milliseconds, the load in percent and
+    #  the task.
+    def __repr__(self):
+        ret_str = f"PERIOD CHANGES {self.count}\n"
+        now = utime.ticks_us()
+        size = len(self._times)
+        count = min(self.count, size)
+        idx = (self._idx - count) % size
+        for _ in range(count):
+            ret_str += '{: 12.6f}{: 10.1f}{: 7.1f}%  {:s}\n'.format(
+                utime.ticks_diff(self._times[idx], now) / 1000000.0,
+                self._periods[idx] / 1000.0, self._loads[idx] / 10.0,
+                self._tasks[idx].name)
+            idx = (idx + 1) % size
+        return ret_str
+
+
+## Find the greatest common divisor of two integers.
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+## An idle hook for @c TaskList which puts the CPU to sleep until the next
+#  interrupt when no task is due to run for a while. Interrupts include the
+#  millisecond SysTick, so the sleep is never much more than a millisecond
+#  and the scheduler will notice the next task's run time soon enough. Set
+#  it up with <tt>task_list.idle_hook = cotask.idle_wait</tt>.
+#  @param time_to_next The time in microseconds until the next timed task
+#         is due, or @c None if no task runs on a timer
+def idle_wait(time_to_next):
+    if time_to_next is None or time_to_next >= IDLE_WAIT_MIN_US:
+        wait_for_interrupt()
+
+
 ## This is @b the main task list which is created for scheduling when 
 #  @c cotask.py is imported into a program. 
 task_list = TaskList()
 
+## This is the log of garbage collections kept by all tasks and task lists.
+gc_log = GCLog()
 
-
-
+## This is the log of period changes made by all task lists.
+period_log = PeriodLog()
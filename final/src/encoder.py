@@ -9,7 +9,7 @@ import math
 
 # just used for sphinx documentation errors, does nothing on the Romi
 try:
-    from time import ticks_us, ticks_diff
+    from utime import ticks_us, ticks_diff
 except ImportError:
     def ticks_us():
         return 0
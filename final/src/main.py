@@ -12,17 +12,26 @@ MAIN
 from motor_driver import motor_driver
 from encoder      import encoder
 from linesensor_driver import linesensor
-from task_motor   import task_motor
+from task_motor   import task_motor, RECORD_FORMAT, RECORD_FIELDS
 from task_user    import task_user
 from task_crash   import task_crash
 from task_button  import task_button
-from task_share   import Share, Queue, show_all
-from cotask       import Task, task_list
+from task_share   import Share, SPSCQueue, RecordShare, VersionedShare, \
+                         RecordQueue, show_all, dump_queues
+from cotask       import Task, task_list, gc_log, period_log, idle_wait, \
+                         SKIP, CATCH_UP
 from gc           import collect
 from pyb import Pin, I2C
 from imu_driver import IMU
 from utime import sleep_ms
-from task_estimator import task_observer
+from task_estimator import task_observer, ESTIMATE_FORMAT, ESTIMATE_FIELDS
+from task_logger import task_logger, StreamLog
+
+# Hardware timers which release the left and right motor tasks, or None to
+# have the scheduler poll the clock for them. In the simulation, release by
+# a timer gave more jitter than polling, so timers are only used when set
+# here, for example to (6, 7) to compare the two on the robot
+MOTOR_TIMERS = None
 
 
 def main():
@@ -43,44 +52,51 @@ def main():
     # Build shares and queues
     leftMotorGo   = Share("B",     name="Left Mot. Go Flag")
     rightMotorGo  = Share("B",     name="Right Mot. Go Flag")
-    Kp            = Share("f",     name="Proportional Gain")
-    Ki            = Share("f",     name="Integral Gain")
+    # The gains are versioned so that the motor tasks only read them again
+    # after the user changes them
+    Kp            = VersionedShare("f", name="Proportional Gain")
+    Ki            = VersionedShare("f", name="Integral Gain")
     setpointLeft  = Share("f",     name="Left Setpoint Value")
     setpointRight = Share("f",     name="Right Setpoint Value")
     stepResponse  = Share("B",     name="Step Response Flag")
-    dataValues_L  = Queue("f", 50, name="Data Collection Buffer Left")
-    dataValues_R  = Queue("f", 50, name="Data Collection Buffer Right")
-    timeValues_L  = Queue("f", 50, name="Time Buffer Left")
-    timeValues_R  = Queue("f", 50, name="Time Buffer Right")
+    # Step response logs: each motor task fills one block of time and
+    # velocity samples while the logger task streams the other one out
+    leftLog       = StreamLog("Left")
+    rightLog      = StreamLog("Right")
     checkIMU      = Share("B",     name="IMU Calibration Check Flag")
 
-    # IMU and observer shares
-    uL            = Share("f",     name="Left Motor Effort")
-    uR            = Share("f",     name="Right Motor Effort")
-    sL            = Share("f",     name="Left Wheel Arc Length")
-    sR            = Share("f",     name="Right Wheel Arc Length")
+    # IMU and observer shares. Each motor task publishes its effort and arc
+    # length together in one record, so the observer reads a matching pair
+    leftRecord    = RecordShare(RECORD_FORMAT, RECORD_FIELDS,
+                                name="Left Motor Record")
+    rightRecord   = RecordShare(RECORD_FORMAT, RECORD_FIELDS,
+                                name="Right Motor Record")
+    # The observer queues its estimates with their times as one record each,
+    # overwriting the oldest if the logger can't keep up
+    estimates     = RecordQueue(ESTIMATE_FORMAT, 8, ESTIMATE_FIELDS,
+                                overwrite=True, name="Estimates")
 
     # Bump sensor queue: stores the pin number of whichever bumper was hit.
     # Size of 4 means up to 4 unread bump events can be buffered before overflow.
-    crashDetect   = Queue("H", 4,  name="Crash Detect Queue")
-    buttonDetect  = Queue("H", 4,  name="Button Detect Queue")
+    # Each is filled by one ISR and emptied by the user task, so they're
+    # single producer, single consumer queues, safe without disabling IRQs
+    crashDetect   = SPSCQueue("H", 4,  name="Crash Detect Queue")
+    buttonDetect  = SPSCQueue("H", 4,  name="Button Detect Queue")
 
     # Build task class objects
     leftMotorTask  = task_motor(leftMotor,  leftEncoder,
-                                leftMotorGo, dataValues_L, timeValues_L,
+                                leftMotorGo, leftLog,
                                 Kp, Ki, setpointLeft, stepResponse,
-                                uL, sL)
+                                leftRecord)
     rightMotorTask = task_motor(rightMotor, rightEncoder,
-                                rightMotorGo, dataValues_R, timeValues_R,
+                                rightMotorGo, rightLog,
                                 Kp, Ki, setpointRight, stepResponse,
-                                uR, sR)
+                                rightRecord)
     userTask = task_user(leftMotorGo, rightMotorGo,
-                         dataValues_L, dataValues_R,
-                         timeValues_L, timeValues_R,
                          Kp, Ki, setpointLeft, setpointRight,
                          myLineSensor, stepResponse, checkIMU,
                          crashDetect, buttonDetect,
-                         sL, sR, myIMU)
+                         leftRecord, rightRecord, myIMU)
 
     # Bump sensor pins: PC10 and PC8.
     # Pin.PULL_UP is configured inside task_crash's ExtInt setup, but we define
@@ -94,31 +110,102 @@ def main():
     )
 
     # psi and psi_dot come from IMU, voltage and arc from motor task
-    observerTask = task_observer(uL, uR, sL, sR, myIMU, checkIMU)
-
-    # Add tasks to task list
-    task_list.append(Task(leftMotorTask.run,  name="Left Mot. Task",
-                          priority=1, period=20,  profile=True))
-    task_list.append(Task(rightMotorTask.run, name="Right Mot. Task",
-                          priority=1, period=20,  profile=True))
-    task_list.append(Task(userTask.run,       name="User Int. Task",
-                          priority=0, period=0,   profile=False))
+    observerTask = task_observer(leftRecord, rightRecord, myIMU, checkIMU,
+                                 estimates)
+
+    # The estimates are only streamed during a step response, like the logs
+    loggerTask = task_logger((leftLog, rightLog), (estimates,), stepResponse)
+
+    # If a control step runs far over its time budget, the other control
+    # loops have been stalled, so stop both motors. The user task keeps them
+    # off and goes back to state 0, so the button must be pressed to run again
+    def stop_motors(task, run_us):
+        userTask.fault()
+        leftMotor.disable()
+        rightMotor.disable()
+        print(f"{task.name} overran its budget ({run_us} us); motors stopped")
+
+    # Add tasks to task list. After a stall such as the IMU calibration, the
+    # control loops and observer skip the periods they missed rather than
+    # running back to back on stale time steps. If the motor tasks are
+    # released by timers, each tick releases them once, so they have no late
+    # policy. Every task's heap allocation is measured so that garbage
+    # collections during runs are logged
+    motor_policy = SKIP if MOTOR_TIMERS is None else CATCH_UP
+    leftMotorTaskObj  = Task(leftMotorTask.run,  name="Left Mot. Task",
+                             priority=1, period=20, profile=True, trace=True,
+                             budget=10, on_overrun=stop_motors, critical=True,
+                             late_policy=motor_policy, alloc=True)
+    rightMotorTaskObj = Task(rightMotorTask.run, name="Right Mot. Task",
+                             priority=1, period=20, profile=True, trace=True,
+                             budget=10, on_overrun=stop_motors, critical=True,
+                             late_policy=motor_policy, alloc=True)
+    if MOTOR_TIMERS is not None:
+        leftMotorTaskObj.use_timer(MOTOR_TIMERS[0])
+        rightMotorTaskObj.use_timer(MOTOR_TIMERS[1])
+    task_list.append(leftMotorTaskObj)
+    task_list.append(rightMotorTaskObj)
+    # The user task runs every 10 ms while it's doing something and parks
+    # while it waits for the button. It's bound to the bump and button queues
+    # so that it's woken as soon as either has an event; the delay from each
+    # event to the task running is shown below the task table
+    userTaskObj = Task(userTask.run,          name="User Int. Task",
+                       priority=0, period=10,  profile=True, trace=True,
+                       alloc=True)
+    task_list.append(userTaskObj)
+    crashDetect.bind(userTaskObj)
+    buttonDetect.bind(userTaskObj)
+    # The observer's matrices are discretized for a 20 ms step, so its
+    # period is fixed; a longer step would make its estimates drift
     task_list.append(Task(observerTask.run,   name="Observer Task",
-                          priority=1, period=20,  profile=True))
+                          priority=1, period=20,  profile=True, trace=True,
+                          budget=10, late_policy=SKIP, alloc=True))
     # Crash task runs at high priority with a short period so debounce is tight.
     # 10 ms period means each bump gets ~10 ms of debounce before re-arm.
     task_list.append(Task(crashTask.run,      name="Crash Task",
-                          priority=2, period=10,  profile=True))
+                          priority=2, period=10,  profile=True, alloc=True))
     task_list.append(Task(buttonTask.run,     name="Button Task",
-                          priority=2, period=200, profile=True))
+                          priority=2, period=200, profile=True, alloc=True,
+                          max_period=400))
+    # The logger sends a chunk of a full block each run, fast enough to
+    # finish a block long before the next one fills at the motor task rate
+    task_list.append(Task(loggerTask.run,     name="Logger Task",
+                          priority=0, period=20,  profile=True, alloc=True))
+
+    # When no task is ready, sleep until the next interrupt rather than
+    # spinning; the idle time is shown in the task table
+    task_list.idle_hook = idle_wait
+
+    # Collect garbage while idle once free memory runs low, so that the
+    # collector rarely has to run in the middle of a control task
+    task_list.gc_free_min = 10000
+
+    # Keep the load over the last 1 s and 10 s so that spikes, such as those
+    # during calibration, can be seen while the robot runs
+    task_list.track_load()
+
+    # Stretch the period of the button task while the load over the last
+    # second is above 80%, and shrink it back below 50%
+    task_list.adapt()
+
+    # A hardware watchdog can be fed only while the motor tasks keep their
+    # deadlines. It can't be stopped once started, so it's off while tuning:
+    # task_list.set_watchdog(machine.WDT(timeout=500), 100)
 
     # Run the garbage collector preemptively
     collect()
 
+    # Choose the scheduling policy: pri_sched (fixed priority), dl_sched
+    # (fixed priority using a deadline queue), edf_sched (earliest deadline
+    # first) or frame_sched (a static frame table, which needs a call to
+    # task_list.build_frames() first). The task table printed at the end
+    # shows deadline misses
+    scheduler = task_list.pri_sched
+
     # Run the scheduler until the user quits the program with Ctrl-C
     while True:
         try:
-            task_list.pri_sched()
+            scheduler()
 
         except KeyboardInterrupt:
             print("Program Terminating")
@@ -126,9 +213,31 @@ def main():
             rightMotor.disable()
             break
 
+        # If a task crashes, stop the motors and show what each task did last
+        except Exception:
+            leftMotor.disable()
+            rightMotor.disable()
+            print(task_list.get_trace())
+            raise
+
     print("\n")
     print(task_list)
+    print(gc_log)
+    print(period_log)
+    print(task_list.analyze())
     print(show_all())
+    print(leftLog)
+    print(rightLog)
+
+    # Save the measured run times so that other periods and priorities can
+    # be tried on a computer with sched_analysis.py
+    with open("profile.csv", "w") as profile:
+        task_list.dump_profile(profile)
+
+    # Save the queue counters too, to see which queues overflowed or kept
+    # tasks waiting
+    with open("queues.csv", "w") as queues:
+        dump_queues(queues)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+''' Schedulability analysis of a set of cotask tasks.
+
+    Each task is described by a record (name, priority, period, wcet,
+    deadline) with times in microseconds; the period and deadline are None
+    for tasks which are only run by go(). Records may be made from the
+    profiling data of a live task list with from_task_list(), or read from a
+    profile written by TaskList.dump_profile(), so the analysis can be run on
+    the Nucleo with task_list.analyze() or on a computer with:
+
+        python sched_analysis.py profile.csv [--period "Observer Task=40"]
+
+    cotask schedulers are non-preemptive: once a task starts running, it runs
+    until it yields. The worst case response time of a task is therefore
+    found with the non-preemptive fixed priority response time analysis:
+    the task may first be blocked by the longest run of any lower priority
+    task, then wait for every run of higher priority tasks released in the
+    meantime, then run itself. Tasks of the same priority take turns in
+    pri_sched(), so they're counted as if they had higher priority. Tasks
+    with no period are assumed to be triggered at most once while a task
+    waits. Run times are the longest measured so far, so a task's profile
+    should cover its slowest states before the results are trusted.
+'''
+
+# Index of each field in a task record
+NAME     = 0
+PRIORITY = 1
+PERIOD   = 2
+WCET     = 3
+DEADLINE = 4
+
+# Header line of a profile written by write_profile()
+PROFILE_HEADER = "name,priority,period_us,wcet_us,deadline_us"
+
+
+def from_task_list(task_list):
+    '''Make task records from the tasks in a cotask TaskList. The run time
+       of a profiled task is its longest measured run; for a task which
+       isn't profiled, it's the task's time budget, or zero if it has none.'''
+    records = []
+    for pri in task_list.pri_list:
+        for task in pri[2:]:
+            wcet = task._slowest if task._prof else task._budget
+            period = task.period if task.period else None
+            deadline = task._rel_deadline if task._rel_deadline else None
+            records.append((task.name, pri[0], period, wcet, deadline))
+    return records
+
+
+def write_profile(records, stream):
+    '''Write task records to a stream as comma separated text, one task
+       per line, with an empty field for a missing period or deadline.'''
+    stream.write(PROFILE_HEADER + "\n")
+    for rec in records:
+        fields = [rec[NAME], str(rec[PRIORITY])]
+        for value in rec[PERIOD:]:
+            fields.append("" if value is None else str(value))
+        stream.write(",".join(fields) + "\n")
+
+
+def read_profile(stream):
+    '''Read task records written by write_profile().'''
+    records = []
+    for line in stream:
+        line = line.strip()
+        if not line or line == PROFILE_HEADER:
+            continue
+        name, pri, period, wcet, deadline = line.split(",")
+        records.append((name, int(pri),
+                        int(period) if period else None,
+                        int(wcet),
+                        int(deadline) if deadline else None))
+    return records
+
+
+def utilization(records, overhead_us=0):
+    '''Find the fraction of the CPU's time used by the timed tasks.'''
+    return sum((rec[WCET] + overhead_us) / rec[PERIOD]
+               for rec in records if rec[PERIOD])
+
+
+def rm_bound(num_tasks):
+    '''The Liu and Layland utilization bound for rate monotonic scheduling
+       of the given number of tasks. It's for preemptive scheduling, so it's
+       only a guide here; the response times are what count.'''
+    if num_tasks == 0:
+        return 1.0
+    return num_tasks * (2 ** (1 / num_tasks) - 1)
+
+
+def not_rate_monotonic(records):
+    '''Find the timed tasks whose priorities aren't rate monotonic, that is,
+       tasks with a higher priority than some task with a shorter period.'''
+    timed = [rec for rec in records if rec[PERIOD]]
+    return [rec[NAME] for rec in timed
+            if any(other[PERIOD] < rec[PERIOD]
+                   and other[PRIORITY] < rec[PRIORITY] for other in timed)]
+
+
+def response_time(rec, records, overhead_us=0):
+    '''Find the worst case response time of one task in microseconds, from
+       its release until its run has finished, or None if it's unbounded
+       because the tasks at its priority and above use all the CPU's time.
+       Each run is taken to cost overhead_us more for the scheduler.'''
+    blocking = 0
+    interfering = []
+    sporadic = 0
+    for other in records:
+        if other is rec:
+            continue
+        cost = other[WCET] + overhead_us
+        if other[PRIORITY] < rec[PRIORITY]:
+            blocking = max(blocking, cost)
+        elif other[PERIOD]:
+            interfering.append((other[PERIOD], cost))
+        else:
+            sporadic += cost
+
+    if sum(cost / period for period, cost in interfering) >= 1.0:
+        return None
+
+    # Iterate to find how long the task may wait before it starts running
+    wait = blocking + sporadic
+    while True:
+        new_wait = blocking + sporadic
+        for period, cost in interfering:
+            new_wait += (wait // period + 1) * cost
+        if new_wait == wait:
+            return wait + rec[WCET] + overhead_us
+        wait = new_wait
+
+
+def analyze(records, overhead_us=0):
+    '''Find the response time of each task. Returns a list holding, for each
+       task, its record, its response time (None if unbounded) and whether
+       it meets its deadline (None if it has no deadline).'''
+    results = []
+    for rec in records:
+        resp = response_time(rec, records, overhead_us)
+        if rec[DEADLINE] is None:
+            meets = None
+        else:
+            meets = resp is not None and resp <= rec[DEADLINE]
+        results.append((rec, resp, meets))
+    return results
+
+
+def _ms(value):
+    '''Format a time in microseconds as milliseconds in a table column.'''
+    if value is None:
+        return "         -"
+    return f"{value / 1000.0: 10.3f}"
+
+
+def report(records, overhead_us=0):
+    '''Make a table of the analysis results, with the utilization and any
+       tasks which may miss their deadlines or aren't rate monotonic.'''
+    ret_str = "TASK             PRI    PERIOD      WCET  DEADLINE  " \
+        "RESPONSE  MEETS\n"
+    misses = []
+    for rec, resp, meets in analyze(records, overhead_us):
+        ret_str += f"{rec[NAME]:<16s}{rec[PRIORITY]: 4d}{_ms(rec[PERIOD])}" \
+            f"{_ms(rec[WCET])}{_ms(rec[DEADLINE])}"
+        ret_str += "       inf" if resp is None else _ms(resp)
+        if meets is None:
+            ret_str += "      -\n"
+        elif meets:
+            ret_str += "    yes\n"
+        else:
+            ret_str += "     NO\n"
+            misses.append(rec[NAME])
+
+    num_timed = sum(1 for rec in records if rec[PERIOD])
+    ret_str += f"UTILIZATION {100 * utilization(records, overhead_us):.1f}%" \
+        f" (rate monotonic bound {100 * rm_bound(num_timed):.1f}%" \
+        f" for {num_timed} timed tasks)\n"
+    if misses:
+        ret_str += "May miss deadlines: " + ", ".join(misses) + "\n"
+    unmeasured = [rec[NAME] for rec in records if rec[WCET] == 0]
+    if unmeasured:
+        ret_str += "No run time measured: " + ", ".join(unmeasured) + "\n"
+    not_rm = not_rate_monotonic(records)
+    if not_rm:
+        ret_str += "Not rate monotonic: " + ", ".join(not_rm) + "\n"
+    return ret_str
+
+
+def _override(records, changes, field):
+    '''Apply NAME=MS changes from the command line to one field.'''
+    for change in changes:
+        name, _, value = change.rpartition("=")
+        for idx, rec in enumerate(records):
+            if rec[NAME] == name:
+                rec = list(rec)
+                rec[field] = int(float(value) * 1000)
+                # A task's deadline is its period unless it was set apart
+                if field == PERIOD and rec[DEADLINE] == records[idx][PERIOD]:
+                    rec[DEADLINE] = rec[PERIOD]
+                records[idx] = tuple(rec)
+                break
+        else:
+            raise SystemExit("No task named " + repr(name) + " in the profile")
+
+
+def main():
+    '''Analyze a profile on the host, optionally trying other periods, run
+       times or priorities to see what they would do.'''
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Schedulability analysis of a dumped cotask profile")
+    parser.add_argument("profile", help="file written by dump_profile()")
+    parser.add_argument("--period", nargs="*", default=(),
+                        metavar="NAME=MS", help="try another task period")
+    parser.add_argument("--wcet", nargs="*", default=(),
+                        metavar="NAME=MS", help="try another run time")
+    parser.add_argument("--priority", nargs="*", default=(),
+                        metavar="NAME=PRI", help="try another priority")
+    parser.add_argument("--overhead", type=float, default=0.0,
+                        help="scheduler time per task run [us]")
+    args = parser.parse_args()
+
+    with open(args.profile) as stream:
+        records = read_profile(stream)
+    _override(records, args.period, PERIOD)
+    _override(records, args.wcet, WCET)
+    for change in args.priority:
+        name, _, value = change.rpartition("=")
+        records = [(rec[NAME], int(value)) + rec[PERIOD:]
+                   if rec[NAME] == name else rec for rec in records]
+    print(report(records, int(args.overhead)), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,66 @@
 import serial
+import struct
 import time
 
+def read_block(ser, header):
+    """
+    Read the samples which follow a "#log <name> <samples> <checksum>" header
+    line from task_logger. Returns a list of "name, time, value" strings, or
+    an empty list if the frame was cut short or text was printed into it;
+    the next frame is then found from its header line.
+    """
+    try:
+        _, name, samples, checksum = header.split()
+        samples, checksum = int(samples), int(checksum)
+    except ValueError:
+        print(f"# dropped a bad header: {header}")
+        return []
+    data = ser.read(8 * samples)
+    if len(data) != 8 * samples or sum(data) & 0xFFFF != checksum:
+        print(f"# dropped a bad frame of {name}")
+        return []
+    n = len(data) // 8 * 2
+    values = struct.unpack(f"<{n}f", data[:n * 4])
+    return [f"{name}, {values[i]:.4f}, {values[i + 1]:.2f}"
+            for i in range(0, len(values), 2)]
+
+def read_records(ser, header):
+    """
+    Read the records which follow a "#rec <name> <records> <format>
+    <checksum>" header line from task_logger. The name may contain spaces.
+    Returns a list of "name, field, field, ..." strings, or an empty list if
+    the frame is bad, as for read_block().
+    """
+    try:
+        name, records, fmt, checksum = header[len("#rec "):].rsplit(" ", 3)
+        size = struct.calcsize(fmt)
+        records, checksum = int(records), int(checksum)
+    except (ValueError, struct.error):
+        print(f"# dropped a bad header: {header}")
+        return []
+    data = ser.read(records * size)
+    if len(data) != records * size or sum(data) & 0xFFFF != checksum:
+        print(f"# dropped a bad frame of {name}")
+        return []
+    return [name + ", " + ", ".join(f"{value:.4g}" for value in record)
+            for record in struct.iter_unpack(fmt, data)]
+
 def read_until_idle(ser, idle_timeout=0.3):
     """
     Read lines from serial until no new data arrives for idle_timeout seconds.
+    Blocks of samples streamed by task_logger are turned into lines of text.
     Returns a list of decoded line strings.
     """
     lines = []
     ser.timeout = 0.6  # Short read timeout so readline() doesn't block long
     while True:
         line = ser.readline().decode(errors="ignore").strip()
-        if line:
+        if line.startswith("#log") or line.startswith("#rec"):
+            read = read_block if line.startswith("#log") else read_records
+            for row in read(ser, line):
+                print(row)
+                lines.append(row)
+        elif line:
             print(line)
             lines.append(line)
         else:
@@ -40,6 +90,13 @@ def main():
                 lines = []
                 while ser.in_waiting:
                     line = ser.readline().decode(errors="ignore").strip()
+                    if line.startswith("#log") or line.startswith("#rec"):
+                        read = read_block if line.startswith("#log") \
+                            else read_records
+                        for row in read(ser, line):
+                            print(row)
+                            lines.append(row)
+                        continue
                     print(line)
                     lines.append(line)
             else:
@@ -17,7 +17,7 @@
 '''
 
 from ulab import numpy as np
-from task_share import Share
+from task_share import Share, RecordShare, RecordQueue
 from pyb import USB_VCP
 from utime import ticks_ms, ticks_diff
 import struct
@@ -66,6 +66,11 @@ C = np.array([
 # Print interval in milliseconds
 PRINT_INTERVAL_MS = 500
 
+# Format and field names of the estimates queued every print interval: the
+# time [ms] and y_hat = [sL_hat, sR_hat, psi_hat, psi_dot_hat]
+ESTIMATE_FORMAT = "<Iffff"
+ESTIMATE_FIELDS = ("time", "sL_hat", "sR_hat", "psi_hat", "psi_dot_hat")
+
 
 class task_observer:
     '''
@@ -73,30 +78,32 @@ class task_observer:
     observer to estimate the state of Romi using encoder and IMU measurements.
 
     Shares read (inputs u and measurements y):
-        uL_share      -- left motor effort  (float, 0-3.1V)
-        uR_share      -- right motor effort (float, 0-3.1V)
-        sL_share      -- left wheel arc length from encoder [mm]
-        sR_share      -- right wheel arc length from encoder [mm]
+        left_record   -- left motor effort  (float, 0-3.1V) and left wheel
+                         arc length from encoder [mm], in one record
+        right_record  -- right motor effort and arc length, in one record
         psi_share     -- heading/yaw angle from IMU [rad]
         psi_dot_share -- yaw rate from IMU [rad/s]
+
+    Queue written (outputs):
+        estimates     -- time stamped estimated outputs y_hat, if given
     '''
 
     def __init__(self,
-                 uL_share:       Share,
-                 uR_share:       Share,
-                 sL_share:       Share,
-                 sR_share:       Share,
+                 left_record:    RecordShare,
+                 right_record:   RecordShare,
                  myIMU,
-                 checkIMU:       Share
+                 checkIMU:       Share,
+                 estimates:      RecordQueue = None
                  ):
         '''
         Args:
-            uL_share        -- Share holding current left motor effort [V]
-            uR_share        -- Share holding current right motor effort [V]
-            sL_share        -- Share holding left encoder arc length [mm]
-            sR_share        -- Share holding right encoder arc length [mm]
+            left_record     -- RecordShare holding current left motor effort
+                               [V] and left encoder arc length [mm]
+            right_record    -- RecordShare holding the same for the right
             psi_share       -- Share holding IMU heading/yaw angle [rad]
             psi_dot_share   -- Share holding IMU yaw rate [rad/s]
+            estimates       -- RecordQueue with ESTIMATE_FORMAT records,
+                               filled every print interval, or None
 
         '''
         
@@ -104,11 +111,10 @@ class task_observer:
         self._imu       = myIMU
         self._checkIMU  = checkIMU
         # --- Input shares (read by this task) ---
-        self._uL       = uL_share
-        self._uR       = uR_share
-        self._sL       = sL_share
-        self._sR       = sR_share
-
+        self._left     = left_record
+        self._right    = right_record
+        # --- Output queue (written by this task) ---
+        self._estimates = estimates
 
         # State estimate vector x_hat = [S, psi, omegaL, omegaR]^T (4x1)
         self._x_hat = np.array([[0.0], [0.0], [0.0], [0.0]])
@@ -179,14 +185,12 @@ class task_observer:
 
             elif self._state == S2_RUN:
 
-                # --- 1. Read inputs u = [uL, uR] from shares ---
-                uL = self._uL.get()
-                uR = self._uR.get()
+                # --- 1, 2. Read inputs u = [uL, uR] and measurements
+                #     y = [sL, sR] from the motor records; each effort and
+                #     arc length pair comes from the same motor task run ---
+                uL, sL  = self._left.get()
+                uR, sR  = self._right.get()
                 # print(uL)
-
-                # --- 2. Read measurements y = [sL, sR] from shares ---
-                sL      = self._sL.get()
-                sR      = self._sR.get()
                 
                 # --- 3. Read measurements from IMU
                 psi,     _, _ = self._imu.get_euler_angles()
@@ -219,6 +223,11 @@ class task_observer:
                     psi_hat     = y_hat[2][0]
                     psi_dot_hat = y_hat[3][0]
 
+                    # Queue the estimates with their time as one record, so
+                    # the logger task can stream them out without printing
+                    if self._estimates is not None:
+                        self._estimates.try_put(now, sL_hat, sR_hat,
+                                                psi_hat, psi_dot_hat)
 
                     '''
                     self._println("--- Observer Estimated Outputs ---")
@@ -0,0 +1,242 @@
+''' Streaming data logger for ME 405 Romi.
+    Runs on a Nucleo STM32 microcontroller using MicroPython.
+    Implemented as a cooperative multitasking generator.
+
+    A StreamLog holds two preallocated blocks of samples. The control task
+    fills one block with log() while the logger task sends the other out
+    over USB serial, then the two swap, so a capture can go on for as long
+    as the logger keeps up rather than stopping when a queue is full.
+
+    Each block is sent a chunk at a time, each chunk as a frame made of a
+    header line followed by the raw samples:
+
+        \r\n#log <name> <samples> <checksum>\r\n
+        <samples> pairs of little-endian float32 values: time [s], value
+
+    and the end of a capture is marked with a line "#end <name>". If the
+    port takes only part of a frame, header or samples, the rest is sent at
+    the logger's next run. Other tasks print text to the same port, which
+    may then land in the middle of a frame. The checksum, the sum of the
+    frame's samples modulo 65536, lets the host drop such a frame, and it
+    finds the next one from the header, which starts a new line.
+
+    The logger also drains task_share.RecordQueues, such as the observer's
+    time stamped estimates, while its enable share is set, sending the
+    records as they're packed in frames with the same kind of checksum:
+
+        \r\n#rec <name> <records> <format> <checksum>\r\n
+        <records> records packed with the struct format
+
+    The host script step_collector.py turns both back into rows of numbers.
+'''
+from pyb import USB_VCP
+import struct
+import micropython
+
+S0_WAIT = micropython.const(0)  # Wait for a block or records to be ready
+S1_SEND = micropython.const(1)  # Send a frame, one chunk of a block per run
+
+# Number of samples in each block; at 50 Hz a block holds one second
+BLOCK_SAMPLES = 50
+
+# Number of bytes of samples sent in each frame, 16 samples. Keeping the
+# frames small keeps each run short however large the blocks are
+CHUNK = 128
+
+# Number of bytes of records drained from a record queue in each run
+RECORD_BYTES = 128
+
+
+class StreamLog:
+    '''
+    Double buffered log of (time, value) samples. One task logs samples and
+    one task_logger sends them; both run in the scheduler, not in interrupts.
+    '''
+
+    def __init__(self, name, block_samples=BLOCK_SAMPLES):
+        self.name = name
+        self._block_len = 8 * block_samples
+        self._blocks = (bytearray(self._block_len),
+                        bytearray(self._block_len))
+        self._views = (memoryview(self._blocks[0]),
+                       memoryview(self._blocks[1]))
+
+        self._fill = 0          # Index of the block being filled
+        self._idx = 0           # Next byte to be written in that block
+        self._ready = -1        # Index of the block waiting to be sent, or -1
+        self._ready_len = 0     # Number of bytes in the block to be sent
+        self._ending = False    # Set when the capture has stopped
+
+        # Counts shown when the log is printed
+        self.samples = 0        # Samples logged
+        self.blocks = 0         # Blocks handed to the logger
+        self.overruns = 0       # Blocks lost because the logger fell behind
+
+    def log(self, t, value):
+        '''Add a sample to the block being filled. When the block is full it
+           is handed to the logger; if the logger is still sending the other
+           block, the full block is dropped and counted as an overrun.'''
+        idx = self._idx
+        struct.pack_into("<ff", self._blocks[self._fill], idx, t, value)
+        idx += 8
+        if idx >= self._block_len:
+            if self._ready < 0:
+                self._ready = self._fill
+                self._ready_len = idx
+                self._fill ^= 1
+                self.blocks += 1
+            else:
+                self.overruns += 1
+            idx = 0
+        self._idx = idx
+        self.samples += 1
+
+    def stop(self):
+        '''End the capture. The logger sends whatever is in the block being
+           filled, then marks the end of the capture.'''
+        self._ending = True
+
+    def _take(self):
+        '''Return the view and length of a block that's ready to be sent,
+           (None, 0) if there's none, or (None, -1) once a stopped capture
+           has been sent in full. When a capture has stopped, the partly
+           filled block is taken once the other block has gone.'''
+        if self._ready < 0 and self._ending:
+            if self._idx == 0:
+                self._ending = False
+                return None, -1
+            self._ready = self._fill
+            self._ready_len = self._idx
+            self._fill ^= 1
+            self._idx = 0
+            self.blocks += 1
+        if self._ready < 0:
+            return None, 0
+        return self._views[self._ready], self._ready_len
+
+    def _sent(self):
+        '''Free the block which the logger has finished sending.'''
+        self._ready = -1
+
+    def __repr__(self):
+        return (f"{self.name:<12s} Log Samples {self.samples} "
+                f"Blocks {self.blocks} Overruns {self.overruns}")
+
+
+class task_logger:
+    '''
+    Low priority task that streams the full blocks of one or more StreamLogs
+    and the contents of any RecordQueues out over USB serial.
+    '''
+
+    def __init__(self, logs, records=(), enable=None):
+        '''
+        Args:
+            logs    -- tuple of StreamLogs whose blocks are sent
+            records -- tuple of RecordQueues which are drained and sent
+            enable  -- Share which must be set for records to be sent, so
+                       they don't fill the terminal all the time, or None
+                       to send them whenever there are any
+        '''
+        self._state   = S0_WAIT
+        self._logs    = logs
+        self._records = records
+        self._enable  = enable
+        self._ser     = USB_VCP()
+
+        # Buffer into which records are drained before they're sent
+        self._rec_buf  = bytearray(RECORD_BYTES)
+        self._rec_view = memoryview(self._rec_buf)
+
+        self._log   = None      # Log whose block is being sent, or None
+        self._view  = None      # View of the block being sent
+        self._len   = 0         # Number of bytes in the block
+        self._sent  = 0         # Number of bytes of it put into frames
+
+        self._head    = b""     # Header line of the frame being sent
+        self._payload = b""     # Samples or records of the frame
+        self._out     = 0       # Number of bytes of the frame written
+
+        print("Logger Task object instantiated")
+
+    def _frame(self, header, payload):
+        '''Start sending a frame made of a header line and a payload.'''
+        self._head    = header.encode()
+        self._payload = payload
+        self._out     = 0
+
+    def _next_chunk(self):
+        '''Start sending the next chunk of the block as a frame.'''
+        end = min(self._sent + CHUNK, self._len)
+        chunk = self._view[self._sent:end]
+        self._sent = end
+        self._frame(f"\r\n#log {self._log.name} {len(chunk) // 8} "
+                    f"{sum(chunk) & 0xFFFF}\r\n", chunk)
+
+    def _send(self):
+        '''Write as much of the frame as the port will take, header first,
+           and return True once all of it has been written.'''
+        head_len = len(self._head)
+        if self._out < head_len:
+            written = self._ser.write(self._head[self._out:])
+            if written:
+                self._out += written
+            if self._out < head_len:
+                return False
+        done = self._out - head_len
+        if done < len(self._payload):
+            written = self._ser.write(self._payload[done:])
+            if written:
+                self._out += written
+        return self._out >= head_len + len(self._payload)
+
+    def run(self):
+
+        while True:
+
+            if self._state == S0_WAIT:
+                for log in self._logs:
+                    view, length = log._take()
+                    if length > 0:
+                        self._log  = log
+                        self._view = view
+                        self._len  = length
+                        self._sent = 0
+                        self._next_chunk()
+                        self._state = S1_SEND
+                        break
+                    if length < 0:
+                        self._frame(f"\r\n#end {log.name}\r\n", b"")
+                        self._state = S1_SEND
+                        break
+                else:
+                    # No block to send, so send any queued records instead.
+                    # They stay in the buffer until the frame has gone
+                    records = self._records
+                    if self._enable is not None and not self._enable.get():
+                        records = ()
+                    for queue in records:
+                        count = queue.get_into(self._rec_buf)
+                        if count:
+                            frame = self._rec_view[:count * queue.record_size]
+                            self._frame(f"\r\n#rec {queue._name} {count} "
+                                        f"{queue.fmt} "
+                                        f"{sum(frame) & 0xFFFF}\r\n", frame)
+                            self._state = S1_SEND
+                            break
+
+            # A frame started above is sent in the same run. When a frame has
+            # gone, the next chunk of the block is started, to be sent at the
+            # next run, until the whole block has been sent
+            if self._state == S1_SEND:
+                if self._send():
+                    if self._log is not None and self._sent < self._len:
+                        self._next_chunk()
+                    else:
+                        if self._log is not None:
+                            self._log._sent()
+                            self._log  = None
+                            self._view = None
+                        self._state = S0_WAIT
+
+            yield self._state
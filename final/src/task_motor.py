@@ -7,7 +7,8 @@
 '''
 from motor_driver import motor_driver
 from encoder      import encoder
-from task_share   import Share, Queue
+from task_share   import Share, RecordShare, VersionedShare
+from task_logger  import StreamLog
 from utime        import ticks_us, ticks_diff
 import micropython
 
@@ -18,40 +19,65 @@ S2_RUN  = micropython.const(2)
 EFFORT_MAX =  100.0
 EFFORT_MIN = -100.0
 
+# Format and field names of the record published each run: the effort as a
+# voltage [V] and the wheel's arc length [mm]
+RECORD_FORMAT = "ff"
+RECORD_FIELDS = ("effort", "arc length")
+
+# Index of each field in the record
+EFFORT     = 0
+ARC_LENGTH = 1
+
 
 class task_motor:
 
     def __init__(self,
                  mot: motor_driver, enc: encoder,
-                 goFlag: Share, dataValues: Queue, timeValues: Queue,
-                 Kp: Share, Ki: Share,
+                 goFlag: Share, log: StreamLog,
+                 Kp: VersionedShare, Ki: VersionedShare,
                  setpoint: Share, stepResponse: Share,
-                 effort: Share, arcLength: Share):
+                 record: RecordShare):
 
         self._state         = S0_INIT
         self._mot           = mot
         self._enc           = enc
         self._goFlag        = goFlag
-        self._dataValues    = dataValues
-        self._timeValues    = timeValues
+        self._log           = log
+        self._logging       = False
         self._startTime     = 0
         self._Kp            = Kp
         self._Ki            = Ki
         self._setpoint      = setpoint
         self._stepResponse  = stepResponse
-        self._effortShare   = effort
-        self._arcLengthShare = arcLength
+        self._record        = record
 
         # PI internal state
         self._integral  = 0.0
         self._prev_time = 0
 
+        # Gains cached from the Kp and Ki shares, and the share versions they
+        # came from; the gains are only read again after the user changes them
+        self._kp    = 0.0
+        self._ki    = 0.0
+        self._kp_ver = -1
+        self._ki_ver = -1
+
         print("Motor Task object instantiated")
 
     def _reset_pi(self):
         self._integral  = 0.0
         self._prev_time = ticks_us()
 
+    def _update_gains(self):
+        '''Read the gains again if either share has changed since they were
+           last read.'''
+        if self._Kp.changed_since(self._kp_ver):
+            self._kp_ver = self._Kp.version()
+            self._kp = self._Kp.get()
+        if self._Ki.changed_since(self._ki_ver):
+            self._ki_ver = self._Ki.version()
+            self._ki = self._Ki.get()
+
     def run(self):
 
         while True:
@@ -84,40 +110,46 @@ class task_motor:
                 if dt > 0.1:        # clamp if scheduler was delayed
                     dt = 0.1
 
-                # 4. Proportional term
-                p_term = self._Kp.get() * err
+                # 4. Proportional term, with the gains as last changed
+                self._update_gains()
+                p_term = self._kp * err
 
                 # 5. Anti-windup: check tentative effort before integrating
-                tentative = p_term + self._Ki.get() * self._integral
+                tentative = p_term + self._ki * self._integral
                 if EFFORT_MIN < tentative < EFFORT_MAX:
                     self._integral += err * dt  # only accumulate if not saturated
 
                 # 6. Final PI effort, then clamp
-                effort = p_term + self._Ki.get() * self._integral
+                effort = p_term + self._ki * self._integral
                 effort = max(EFFORT_MIN, min(EFFORT_MAX, effort))
 
                 # 7. Drive motor
                 self._mot.enable()
                 self._mot.set_effort(effort)
 
-                # 8. Publish to shares
-                self._effortShare.put(abs(effort * 3.1 / 100.0))
-                self._arcLengthShare.put(self._enc.get_position())
+                # 8. Publish effort and arc length together in one record,
+                #    so readers never mix values from different runs
+                self._record.put(abs(effort * 3.1 / 100.0),
+                                 self._enc.get_position())
 
-                # 9. Log data if step response active
+                # 9. Log data if step response active. The logger task
+                #    streams each full block out while the next one fills,
+                #    so the capture runs until the flag is cleared
                 t = ticks_us()
                 if self._stepResponse.get():
-                    self._dataValues.put(vel)
-                    self._timeValues.put(ticks_diff(t, self._startTime) / 1_000_000.0)
-                    if self._dataValues.full():
-                        self._state = S1_WAIT
-                        self._goFlag.put(False)
-                        self._mot.disable()
+                    self._log.log(ticks_diff(t, self._startTime) / 1_000_000.0, vel)
+                    self._logging = True
+                elif self._logging:
+                    self._log.stop()
+                    self._logging = False
 
                 # 10. Stop if go flag cleared externally
                 if self._goFlag.get() == False:
                     self._state = S1_WAIT
                     self._mot.disable()
                     self._reset_pi()
+                    if self._logging:
+                        self._log.stop()
+                        self._logging = False
 
             yield self._state
\ No newline at end of file
@@ -23,7 +23,9 @@
 
 import array
 import gc
+import struct
 import pyb
+import utime
 import micropython
 
 
@@ -39,6 +41,19 @@ type_code_strings = {'b' : "int8",   'B' : "uint8",
                      'q' : "int64",  'Q' : "uint64",
                      'f' : "float",  'd' : "double"}
 
+## Result code from the @c try_ and @c _wait methods of a queue: the item was
+#  put in or taken out
+OK = micropython.const (0)
+
+## Result code: the queue was full, so the item was dropped
+FULL = micropython.const (1)
+
+## Result code: the queue was empty, so nothing was read
+EMPTY = micropython.const (2)
+
+## Result code: the queue stayed full or empty until the timeout ran out
+TIMEOUT = micropython.const (3)
+
 
 ## Create a string holding a diagnostic printout showing the status of
 #  each queue and share in the system. 
@@ -48,6 +63,24 @@ def show_all ():
     return '\n'.join (gen)
 
 
+## Header line of the table written by @c dump_queues()
+QUEUE_HEADER = "name,type,size,max_full,puts,gets,drops,evictions,blocked_us"
+
+
+## Write the counters of every queue in the system to a stream as comma
+#  separated text, one queue per line, so that they can be read by a
+#  program on a computer rather than by eye.
+#  @param stream A file or other stream opened for writing
+def dump_queues (stream):
+    stream.write (QUEUE_HEADER + '\n')
+    for item in share_list:
+        if isinstance (item, (Queue, RecordQueue)):
+            stream.write ('{:s},{:s},{:d},{:d},{:d},{:d},{:d},{:d},{:d}\n'
+                .format (item._name, item._type_code, item._size,
+                         item._max_full, item._puts, item._gets,
+                         item._drops, item._evictions, item._blocked_us))
+
+
 ## Base class for queues and shares which exchange data between tasks.
 # 
 #  One should never create an object from this class; it doesn't do anything
@@ -62,10 +95,25 @@ class BaseShare:
         self._type_code = type_code
         self._thread_protect = thread_protect
 
+        # The task which is woken up when data is put in, if any
+        self._consumer = None
+
         # Add this queue to the global share and queue list
         share_list.append (self)
 
 
+    ## Bind a consumer task to this queue or share.
+    #
+    #  Once a task has been bound, each @c put() calls the task's @c go()
+    #  method, including puts from interrupt service routines, so the task
+    #  runs soon after data arrives. A task with no period which is bound to
+    #  its inputs uses no time at all until there is something for it to do,
+    #  and a task parked on a @c cotask.WaitQueue wakes as soon as possible.
+    #  @param task The @c cotask.Task to be woken, or @c None to unbind
+    def bind (self, task):
+        self._consumer = task
+
+
 ## A queue which is used to transfer data from one task to another.
 #
 #  If parameter 'thread_protect' is @c True when a queue is created, transfers
@@ -138,6 +186,13 @@ class Queue (BaseShare):
             self._buffer = None
             raise
 
+        # A view of the buffer through which runs of items are copied
+        self._view = memoryview (self._buffer)
+
+        # Wait objects for put_wait() and get_wait(), made when first needed
+        self._room_wait = None
+        self._data_wait = None
+
         # Initialize pointers to be used for reading and writing data
         self.clear ()
 
@@ -162,40 +217,59 @@ class Queue (BaseShare):
     #                 my_queue.put (create_something_to_put ())
     #             yield 0
     #  @endcode
+    #  In a cooperative scheduler the consumer can't run while this waits,
+    #  so @c try_put() or @c put_wait() is usually better. Time spent
+    #  waiting is counted as blocked time, and items dropped in an ISR are
+    #  counted as drops.
     #  @param item The item to be placed into the queue
     #  @param in_ISR Set this to @c True if calling from within an ISR
     @micropython.native
     def put (self, item, in_ISR = False):
         # If we're in an ISR and the queue is full and we're not allowed to
-        # overwrite data, we have to give up and exit
+        # overwrite data, we have to give up and exit. The consumer is still
+        # woken, as it clearly has some catching up to do
         if self.full ():
             if in_ISR:
+                self._drops += 1
+                if self._consumer is not None:
+                    self._consumer.go ()
                 return
 
             # Wait (if needed) until there's room in the buffer for the data
             if not self._overwrite:
+                start = utime.ticks_us ()
                 while self.full ():
                     pass
+                self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
             _irq_state = pyb.disable_irq ()
 
-        # Write the data and advance the counts and pointers
+        # Write the data and advance the counts and pointers. If the queue
+        # was full, the oldest item has been overwritten, so the read
+        # pointer moves past it
         self._buffer[self._wr_idx] = item
         self._wr_idx += 1
         if self._wr_idx >= self._size:
             self._wr_idx = 0
-        self._num_items += 1
-        if self._num_items >= self._size:        # Can't be fuller than full
-            self._num_items = self._size
+        if self._num_items < self._size:         # Can't be fuller than full
+            self._num_items += 1
+        else:
+            self._rd_idx = self._wr_idx
+            self._evictions += 1
         if self._num_items > self._max_full:     # Record maximum fillage
             self._max_full = self._num_items
+        self._puts += 1
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (_irq_state)
 
+        # Wake up the task which uses the data
+        if self._consumer is not None:
+            self._consumer.go ()
+
 
     ## Read an item from the queue.
     # 
@@ -213,12 +287,18 @@ class Queue (BaseShare):
     #             # More loop stuff
     #             yield 0
     #  @endcode
+    #  In a cooperative scheduler the producer can't run while this waits
+    #  unless it's an interrupt, so @c try_get() or @c get_wait() is usually
+    #  better. Time spent waiting is counted as blocked time.
     #  @param in_ISR Set this to @c True if calling from within an ISR
     @micropython.native
     def get (self, in_ISR = False):
         # Wait until there's something in the queue to be returned
-        while self.empty ():
-            pass
+        if self.empty ():
+            start = utime.ticks_us ()
+            while self.empty ():
+                pass
+            self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
@@ -234,6 +314,7 @@ class Queue (BaseShare):
         self._num_items -= 1
         if self._num_items < 0:
             self._num_items = 0
+        self._gets += 1
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
@@ -242,6 +323,291 @@ class Queue (BaseShare):
         return (to_return)
 
 
+    ## Put a number of items into the queue at once.
+    #
+    #  The items are copied in as at most two runs, one up to the end of the
+    #  buffer and one from its start, within one critical section, so this
+    #  is much quicker than calling @c put() for each item. It never waits
+    #  for room: if the queue was created with @c overwrite set, the oldest
+    #  items are overwritten as needed and counted as evicted, and if there
+    #  are more items than the queue holds, only the last ones are put in;
+    #  if not, only as many items as fit are put in. Items which aren't put
+    #  in are counted as dropped. Arrays and memoryviews of the queue's type,
+    #  and bytearrays if the type is @c 'B', are copied straight from. For
+    #  other types, a bytearray holds the items packed as raw bytes, so its
+    #  length must be a whole number of items. Other iterables of numbers
+    #  are first made into an array; that and a bytearray for another type
+    #  allocate memory.
+    #  @code
+    #     samples = array.array ('f', [0.0] * 10)
+    #     # ... fill samples ...
+    #     my_queue.put_many (samples)
+    #  @endcode
+    #  @param items The items to be placed into the queue
+    #  @param in_ISR Set this to @c True if calling from within an ISR
+    #  @return The number of items put into the queue
+    @micropython.native
+    def put_many (self, items, in_ISR = False):
+        if not isinstance (items, (array.array, memoryview)) \
+                and not (self._type_code == 'B'
+                         and isinstance (items, bytearray)):
+            items = array.array (self._type_code, items)
+        src = memoryview (items)
+        count = len (src)
+        size = self._size
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        # Work out how many items will go in, and if old ones are to be
+        # overwritten, move the read pointer past them
+        room = size - self._num_items
+        if count > room:
+            if self._overwrite:
+                if count > size:
+                    self._drops += count - size
+                    src = src[count - size:]
+                    count = size
+                evict = count - room
+                self._evictions += evict
+                self._rd_idx += evict
+                if self._rd_idx >= size:
+                    self._rd_idx -= size
+                self._num_items -= evict
+            else:
+                self._drops += count - room
+                count = room
+
+        # Copy the items in, wrapping around the end of the buffer at most
+        # once, and advance the counts and pointers
+        if count > 0:
+            wr_idx = self._wr_idx
+            first = size - wr_idx
+            if first > count:
+                first = count
+            self._view[wr_idx:wr_idx + first] = src[:first]
+            if count > first:
+                self._view[:count - first] = src[first:count]
+            wr_idx += count
+            if wr_idx >= size:
+                wr_idx -= size
+            self._wr_idx = wr_idx
+            self._num_items += count
+            if self._num_items > self._max_full:
+                self._max_full = self._num_items
+            self._puts += count
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        # Wake up the task which uses the data
+        if count > 0 and self._consumer is not None:
+            self._consumer.go ()
+        return count
+
+
+    ## Read a number of items from the queue into a buffer at once.
+    #
+    #  As many items as are in the queue, up to the length of the buffer, are
+    #  copied out as at most two runs within one critical section, so this is
+    #  much quicker than calling @c get() for each item. It never waits for
+    #  items to arrive; if the queue is empty, nothing is read. As the buffer
+    #  is made beforehand, reading this way doesn't allocate memory for the
+    #  items:
+    #  @code
+    #     samples = array.array ('f', [0.0] * 50)
+    #     # ... then, in a task ...
+    #     count = my_queue.get_into (samples)
+    #     for idx in range (count):
+    #         do_something_with (samples[idx])
+    #  @endcode
+    #  @param buffer An array or memoryview of the queue's type into which
+    #         the items are read, starting at its beginning
+    #  @param in_ISR Set this to @c True if calling from within an ISR
+    #  @return The number of items read into the buffer
+    @micropython.native
+    def get_into (self, buffer, in_ISR = False):
+        dest = memoryview (buffer)
+        size = self._size
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        count = self._num_items
+        if count > len (dest):
+            count = len (dest)
+
+        # Copy the items out, wrapping around the end of the buffer at most
+        # once, then move the read pointer and adjust the number of items
+        if count > 0:
+            rd_idx = self._rd_idx
+            first = size - rd_idx
+            if first > count:
+                first = count
+            dest[:first] = self._view[rd_idx:rd_idx + first]
+            if count > first:
+                dest[first:count] = self._view[:count - first]
+            rd_idx += count
+            if rd_idx >= size:
+                rd_idx -= size
+            self._rd_idx = rd_idx
+            self._num_items -= count
+            self._gets += count
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        return count
+
+
+    ## Try to put an item into the queue without waiting for room, or
+    #  waiting no longer than a timeout.
+    #
+    #  Unlike @c put(), this never waits for a consumer which can't run until
+    #  the calling task yields. If the queue is full and can't be
+    #  overwritten, the item is dropped and counted; with a timeout, which is
+    #  only sensible when the consumer is an interrupt, the queue is watched
+    #  until the timeout runs out first. In an ISR, an item for a full queue
+    #  is dropped even if the queue may be overwritten, as by @c put():
+    #  @code
+    #     if my_queue.try_put (reading) != task_share.OK:
+    #         print ("Reading dropped")
+    #  @endcode
+    #  @param item The item to be placed into the queue
+    #  @param timeout The longest time to wait for room in milliseconds, or
+    #         zero not to wait
+    #  @param in_ISR Set this to @c True if calling from within an ISR
+    #  @return @c OK if the item was put in, @c FULL if it was dropped right
+    #          away or @c TIMEOUT if it was dropped after the timeout
+    @micropython.native
+    def try_put (self, item, timeout = 0, in_ISR = False):
+        if self.full ():
+            if in_ISR:
+                self.put (item, True)               # Counts the drop
+                return FULL
+            if not self._overwrite:
+                if timeout:
+                    self._spin (True, timeout)
+                if self.full ():
+                    self._drops += 1
+                    return TIMEOUT if timeout else FULL
+        self.put (item, in_ISR)
+        return OK
+
+
+    ## Try to read an item from the queue without waiting for one, or
+    #  waiting no longer than a timeout.
+    #
+    #  Unlike @c get(), this never waits for a producer which can't run until
+    #  the calling task yields. The result code comes with the item:
+    #  @code
+    #     code, something = my_queue.try_get ()
+    #     if code == task_share.OK:
+    #         do_something_with (something)
+    #  @endcode
+    #  The result tuple is allocated, which can't be done in an ISR, so an
+    #  ISR should check @c any() and then call @c get() instead.
+    #  @param timeout The longest time to wait for an item in milliseconds,
+    #         or zero not to wait
+    #  @param in_ISR Must be @c False; @c True raises a @c ValueError
+    #  @return A tuple of a result code, @c OK, @c EMPTY or @c TIMEOUT, and
+    #          the item, or @c None if there wasn't one
+    @micropython.native
+    def try_get (self, timeout = 0, in_ISR = False):
+        if in_ISR:
+            raise ValueError ("try_get() allocates; use get() in an ISR")
+        if self.empty ():
+            if timeout:
+                self._spin (False, timeout)
+            if self.empty ():
+                return (TIMEOUT if timeout else EMPTY), None
+        return OK, self.get ()
+
+
+    ## Wait until the queue has room or an item, or until a timeout runs out,
+    #  counting the time spent as blocked.
+    #  @param for_room @c True to wait for room or @c False for an item
+    #  @param timeout The longest time to wait in milliseconds
+    def _spin (self, for_room, timeout):
+        start = utime.ticks_us ()
+        until = utime.ticks_add (start, int (timeout * 1000))
+        while (self.full () if for_room else self.empty ()) \
+                and utime.ticks_diff (utime.ticks_us (), until) < 0:
+            pass
+        self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
+
+
+    ## Put an item into the queue from a task, letting other tasks run while
+    #  waiting for room.
+    #
+    #  This is a generator to be used with @c yield @c from in a task's
+    #  generator. If the queue is full and can't be overwritten, it yields a
+    #  @c cotask.WaitRoom so that the scheduler parks the task until the
+    #  consumer has made room or the timeout has run out. The wait object is
+    #  made the first time it's needed and reused afterwards:
+    #  @code
+    #     def producer_task ():
+    #         while True:
+    #             code = yield from my_queue.put_wait (make_item (), 100)
+    #             yield 0
+    #  @endcode
+    #  @param item The item to be placed into the queue
+    #  @param timeout The longest time to wait for room in milliseconds, or
+    #         @c None to wait as long as it takes
+    #  @return @c OK if the item was put in or @c TIMEOUT if it was dropped
+    def put_wait (self, item, timeout = None):
+        if self.full () and not self._overwrite:
+            if self._room_wait is None:
+                from cotask import WaitRoom
+                self._room_wait = WaitRoom (self)
+            self._room_wait.set_timeout (timeout)
+            start = utime.ticks_us ()
+            yield self._room_wait
+            self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
+            if self.full ():
+                self._drops += 1
+                return TIMEOUT
+        self.put (item)
+        return OK
+
+
+    ## Read an item from the queue in a task, letting other tasks run while
+    #  waiting for one.
+    #
+    #  This is a generator to be used with @c yield @c from in a task's
+    #  generator. If the queue is empty, it yields a @c cotask.WaitQueue so
+    #  that the scheduler parks the task until an item arrives or the timeout
+    #  has run out:
+    #  @code
+    #     def consumer_task ():
+    #         while True:
+    #             code, something = yield from my_queue.get_wait (500)
+    #             if code == task_share.OK:
+    #                 do_something_with (something)
+    #             yield 0
+    #  @endcode
+    #  @param timeout The longest time to wait for an item in milliseconds,
+    #         or @c None to wait as long as it takes
+    #  @return A tuple of a result code, @c OK or @c TIMEOUT, and the item,
+    #          or @c None if there wasn't one
+    def get_wait (self, timeout = None):
+        if self.empty ():
+            if self._data_wait is None:
+                from cotask import WaitQueue
+                self._data_wait = WaitQueue (self)
+            self._data_wait.set_timeout (timeout)
+            start = utime.ticks_us ()
+            yield self._data_wait
+            self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
+            if self.empty ():
+                return TIMEOUT, None
+        return OK, self.get ()
+
+
     ## Check if there are any items in the queue.
     # 
     #  Returns @c True if there are any items in the queue and @c False
@@ -289,14 +655,253 @@ class Queue (BaseShare):
         self._num_items = 0
         self._max_full = 0
 
+        # The numbers of items put in and taken out, of items dropped
+        # because the queue was full and of old items lost by overwriting,
+        # and the total time in microseconds which tasks spent waiting to
+        # put or get. The producer and consumer each count their own side
+        self._puts = 0
+        self._gets = 0
+        self._drops = 0
+        self._evictions = 0
+        self._blocked_us = 0
+
 
     ## This method puts diagnostic information about the queue into a string.
     # 
-    #  It shows the queue's name and type as well as the maximum number of
-    #  items and queue size. 
+    #  It shows the queue's name and type, the maximum number of items and
+    #  queue size, the numbers of items put in and taken out, dropped and
+    #  lost to overwriting, and the time tasks were blocked in milliseconds.
     def __repr__ (self):
-        return ('{:<12s} Queue<{:s}> Max Full {:d}/{:d}'.format (self._name,
-                type_code_strings[self._type_code], self._max_full, self._size))
+        return ('{:<12s} Queue<{:s}> Max Full {:d}/{:d} Puts {:d} Gets {:d} '
+                'Drops {:d} Evicted {:d} Blocked {:.1f} ms'.format (
+                self._name, type_code_strings[self._type_code],
+                self._max_full, self._size, self._puts, self._gets,
+                self._drops, self._evictions, self._blocked_us / 1000.0))
+
+
+# ============================================================================
+
+## A queue for one producer and one consumer which never disables interrupts.
+#
+#  An ordinary @c Queue keeps a count of its items which both the producer
+#  and the consumer change, so unless it's protected by disabling interrupts
+#  an interrupt can corrupt it. This queue has no shared count: the producer
+#  only writes the write index and the consumer only writes the read index,
+#  and the count is worked out from the two. Each index is written after the
+#  data it covers, so the other side never sees a half finished transfer.
+#  One slot of the buffer is always left empty so that a full queue can be
+#  told apart from an empty one.
+#
+#  This is safe as long as only one task or interrupt puts items in and only
+#  one takes them out, as with an interrupt service routine sending events
+#  to a task. It has the same methods as @c Queue, but it can't overwrite old
+#  data, as only the consumer may move the read index.
+#  @code
+#  import task_share
+#
+#  # This queue carries pin numbers from an ISR to a task
+#  my_queue = task_share.SPSCQueue ('H', 4, name="My Events")
+#
+#  # In the interrupt service routine
+#  my_queue.put (pin, in_ISR = True)
+#
+#  # In the task
+#  if my_queue.any ():
+#      pin = my_queue.get ()
+#  @endcode
+class SPSCQueue (Queue):
+
+    ## Initialize a single producer, single consumer queue.
+    #
+    #  The type codes are as for @c Queue. Its buffer has one more slot than
+    #  the number of items which it can hold.
+    #  @param type_code The type of data items which the queue can hold
+    #  @param size The maximum number of items which the queue can hold
+    #  @param name A short name for the queue, default @c QueueN where @c N
+    #         is a serial number for the queue
+    def __init__ (self, type_code, size, name = None):
+        super ().__init__ (type_code, size + 1, False, False, name)
+        self._slots = size + 1
+        self._size = size
+
+
+    ## Put an item into the queue. Only the producer may call this.
+    #
+    #  If the queue is full, wait until the consumer makes room, unless
+    #  called from an ISR, in which case the item is dropped and the
+    #  consumer is woken to catch up.
+    #  @param item The item to be placed into the queue
+    #  @param in_ISR Set this to @c True if calling from within an ISR
+    @micropython.native
+    def put (self, item, in_ISR = False):
+        wr_idx = self._wr_idx
+        next_idx = wr_idx + 1
+        if next_idx >= self._slots:
+            next_idx = 0
+        if next_idx == self._rd_idx:
+            if in_ISR:
+                self._drops += 1
+                if self._consumer is not None:
+                    self._consumer.go ()
+                return
+            start = utime.ticks_us ()
+            while next_idx == self._rd_idx:
+                pass
+            self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
+
+        # Write the data, then publish it by moving the write index
+        self._buffer[wr_idx] = item
+        self._wr_idx = next_idx
+        self._puts += 1
+
+        # Record maximum fillage, which only the producer writes
+        count = next_idx - self._rd_idx
+        if count < 0:
+            count += self._slots
+        if count > self._max_full:
+            self._max_full = count
+
+        # Wake up the task which uses the data
+        if self._consumer is not None:
+            self._consumer.go ()
+
+
+    ## Read an item from the queue. Only the consumer may call this.
+    #
+    #  If the queue is empty, wait until something is put in.
+    #  @param in_ISR Accepted for compatibility with @c Queue; not needed
+    @micropython.native
+    def get (self, in_ISR = False):
+        rd_idx = self._rd_idx
+        if rd_idx == self._wr_idx:
+            start = utime.ticks_us ()
+            while rd_idx == self._wr_idx:
+                pass
+            self._blocked_us += utime.ticks_diff (utime.ticks_us (), start)
+
+        # Read the data, then free its slot by moving the read index
+        to_return = self._buffer[rd_idx]
+        rd_idx += 1
+        if rd_idx >= self._slots:
+            rd_idx = 0
+        self._rd_idx = rd_idx
+        self._gets += 1
+        return to_return
+
+
+    ## Put a number of items into the queue at once. Only the producer may
+    #  call this.
+    #
+    #  As for @c Queue.put_many(), the items are copied as at most two runs
+    #  and only as many items as fit are put in, the rest being counted as
+    #  dropped; they're all published together when the write index is moved
+    #  at the end.
+    #  @param items The items to be placed into the queue
+    #  @param in_ISR Accepted for compatibility with @c Queue; not needed
+    #  @return The number of items put into the queue
+    @micropython.native
+    def put_many (self, items, in_ISR = False):
+        if not isinstance (items, (array.array, memoryview)) \
+                and not (self._type_code == 'B'
+                         and isinstance (items, bytearray)):
+            items = array.array (self._type_code, items)
+        src = memoryview (items)
+        slots = self._slots
+        wr_idx = self._wr_idx
+        used = wr_idx - self._rd_idx
+        if used < 0:
+            used += slots
+        count = len (src)
+        if count > self._size - used:
+            self._drops += count - (self._size - used)
+            count = self._size - used
+
+        if count > 0:
+            first = slots - wr_idx
+            if first > count:
+                first = count
+            self._view[wr_idx:wr_idx + first] = src[:first]
+            if count > first:
+                self._view[:count - first] = src[first:count]
+            wr_idx += count
+            if wr_idx >= slots:
+                wr_idx -= slots
+            self._wr_idx = wr_idx
+            self._puts += count
+            if used + count > self._max_full:
+                self._max_full = used + count
+            if self._consumer is not None:
+                self._consumer.go ()
+        return count
+
+
+    ## Read a number of items from the queue into a buffer at once. Only the
+    #  consumer may call this.
+    #
+    #  As for @c Queue.get_into(), the items are copied as at most two runs
+    #  and nothing waits; their slots are freed together at the end.
+    #  @param buffer An array or memoryview of the queue's type into which
+    #         the items are read, starting at its beginning
+    #  @param in_ISR Accepted for compatibility with @c Queue; not needed
+    #  @return The number of items read into the buffer
+    @micropython.native
+    def get_into (self, buffer, in_ISR = False):
+        dest = memoryview (buffer)
+        slots = self._slots
+        rd_idx = self._rd_idx
+        count = self._wr_idx - rd_idx
+        if count < 0:
+            count += slots
+        if count > len (dest):
+            count = len (dest)
+
+        if count > 0:
+            first = slots - rd_idx
+            if first > count:
+                first = count
+            dest[:first] = self._view[rd_idx:rd_idx + first]
+            if count > first:
+                dest[first:count] = self._view[:count - first]
+            rd_idx += count
+            if rd_idx >= slots:
+                rd_idx -= slots
+            self._rd_idx = rd_idx
+            self._gets += count
+        return count
+
+
+    ## Check if there are any items in the queue.
+    #  @return @c True if items are in the queue, @c False if not
+    @micropython.native
+    def any (self):
+        return self._rd_idx != self._wr_idx
+
+
+    ## Check if the queue is empty.
+    #  @return @c True if queue is empty, @c False if it's not empty
+    @micropython.native
+    def empty (self):
+        return self._rd_idx == self._wr_idx
+
+
+    ## Check if the queue is full.
+    #  @return @c True if the queue is full
+    @micropython.native
+    def full (self):
+        next_idx = self._wr_idx + 1
+        if next_idx >= self._slots:
+            next_idx = 0
+        return next_idx == self._rd_idx
+
+
+    ## Check how many items are in the queue.
+    #  @return The number of items in the queue
+    @micropython.native
+    def num_in (self):
+        count = self._wr_idx - self._rd_idx
+        if count < 0:
+            count += self._slots
+        return count
 
 
 # ============================================================================
@@ -380,6 +985,10 @@ class Share (BaseShare):
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (irq_state)
 
+        # Wake up the task which uses the data
+        if self._consumer is not None:
+            self._consumer.go ()
+
 
     ## Read an item of data from the share.
     # 
@@ -410,3 +1019,464 @@ class Share (BaseShare):
                 type_code_strings[self._type_code]))
 
 
+# ============================================================================
+
+## A share which counts its changes, so readers can tell when it has changed.
+#
+#  Each @c put() moves the share's version on, so a task which works
+#  something out from the share's value can keep the result along with the
+#  version it came from and check @c changed_since() each run, which is
+#  cheaper than reading the value, only recomputing when it has changed:
+#  @code
+#  # In the task's setup
+#  gain_version = my_gain.version ()
+#  gain = my_gain.get ()
+#
+#  # Each run
+#  if my_gain.changed_since (gain_version):
+#      gain_version = my_gain.version ()
+#      gain = my_gain.get ()
+#  @endcode
+#  The version is read before the value, so a change between the two reads
+#  is seen at the next check.
+#
+#  Instead of disabling interrupts, the share works as a sequence lock: the
+#  version is odd while a @c put() is writing and even otherwise, and
+#  @c get() reads again if the version was odd or changed during its read.
+#  It's meant for one producer, which may be an ISR, and readers which are
+#  tasks; an ISR mustn't read a share which a task writes, as the task
+#  couldn't finish a write while the ISR waited for it.
+class VersionedShare (Share):
+
+    ## Create a versioned share. The type codes are as for @c Share.
+    #  @param type_code The type of data items which the share can hold
+    #  @param name A short name for the share, default @c ShareN where @c N
+    #         is a serial number for the share
+    def __init__ (self, type_code, name = None):
+        super ().__init__ (type_code, False, name)
+        self._version = 0
+
+
+    ## Write an item of data into the share and move the version on.
+    #  @param data The data to be put into this share
+    #  @param in_ISR Accepted for compatibility with @c Share; not needed
+    @micropython.native
+    def put (self, data, in_ISR = False):
+        # Make the version odd while writing, then even again; it's kept
+        # within a small integer so that counting doesn't allocate memory
+        self._version = (self._version + 1) & 0x3FFFFFFF
+        self._buffer[0] = data
+        self._version = (self._version + 1) & 0x3FFFFFFF
+
+        # Wake up the task which uses the data
+        if self._consumer is not None:
+            self._consumer.go ()
+
+
+    ## Read an item of data from the share, reading again if a write was
+    #  under way or happened during the read.
+    #  @param in_ISR Accepted for compatibility with @c Share; not needed
+    @micropython.native
+    def get (self, in_ISR = False):
+        while True:
+            version = self._version
+            if not version & 1:
+                to_return = self._buffer[0]
+                if self._version == version:
+                    return (to_return)
+
+
+    ## Get the share's version, which changes each time data is put in.
+    #  @return The version, an even number
+    @micropython.native
+    def version (self):
+        return (self._version & 0x3FFFFFFE)
+
+
+    ## Check whether the share has changed since a given version.
+    #  @param version A version from @c version()
+    #  @return @c True if data has been put in since then
+    @micropython.native
+    def changed_since (self, version):
+        return (self._version != version)
+
+
+    ## Puts diagnostic information about the share into a string.
+    def __repr__ (self):
+        return ("{:<12s} Share<{:s}> Version {:d}".format (self._name,
+                type_code_strings[self._type_code], self._version // 2))
+
+
+# ============================================================================
+
+## A share which holds a record of several fields, written and read whole.
+#
+#  When a task publishes several values through separate shares, a reader
+#  may get some values from one run of the task and some from the next.
+#  A record share keeps all the fields in one preallocated @c bytearray
+#  packed with @c struct, so one @c put() writes the whole record and one
+#  @c get() returns a consistent snapshot of it, each within a single
+#  critical section.
+#
+#  An example of the creation and use of a record share is as follows:
+#  @code
+#  import task_share
+#
+#  # This record holds a float and a signed 16-bit integer
+#  my_record = task_share.RecordShare ('fh', ("speed", "count"),
+#                                      name="My Record")
+#
+#  # Somewhere in one task, put data into the record
+#  my_record.put (speed, count)
+#
+#  # In another task, read the record
+#  speed, count = my_record.get ()
+#  @endcode
+class RecordShare (BaseShare):
+
+    ## A counter used to give serial numbers to records for diagnostic use.
+    ser_num = 0
+
+
+    ## Create a record share.
+    #
+    #  The fields are given as a format string for the @c struct module,
+    #  one type code per field, using the type codes listed for @c Share.
+    #  The record starts with every field zero.
+    #  @param fmt The @c struct format of the record, such as @c 'ff'
+    #  @param fields A tuple of the names of the fields, used in diagnostic
+    #         printouts, or @c None
+    #  @param thread_protect True if mutual exclusion protection is used
+    #  @param name A short name for the record, default @c RecordN where
+    #         @c N is a serial number for the record
+    def __init__ (self, fmt, fields = None, thread_protect = True,
+                  name = None):
+        # First call the parent class initializer
+        super ().__init__ (fmt, thread_protect, name)
+
+        self._buffer = bytearray (struct.calcsize (fmt))
+        self._fields = fields
+
+        self._name = str (name) if name != None \
+            else 'Record' + str (RecordShare.ser_num)
+        RecordShare.ser_num += 1
+
+
+    ## Write the whole record.
+    #
+    #  All the fields are packed into the record within one critical
+    #  section, so no reader can see some new fields and some old ones.
+    #  @param values The value of each field, in order
+    #  @param in_ISR Set this to True if calling from within an ISR
+    def put (self, *values, in_ISR = False):
+
+        # Disable interrupts before writing the data
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        struct.pack_into (self._type_code, self._buffer, 0, *values)
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        # Wake up the task which uses the data
+        if self._consumer is not None:
+            self._consumer.go ()
+
+
+    ## Read the whole record.
+    #
+    #  All the fields are unpacked within one critical section, so they all
+    #  come from the same @c put().
+    #  @param in_ISR Set this to True if calling from within an ISR
+    #  @return A tuple holding the value of each field, in order
+    def get (self, in_ISR = False):
+        # Disable interrupts before reading the data
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        to_return = struct.unpack_from (self._type_code, self._buffer)
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        return (to_return)
+
+
+    ## Puts diagnostic information about the record into a string.
+    #
+    #  The record's name is shown with the type and, if given, the name of
+    #  each field.
+    def __repr__ (self):
+        types = [type_code_strings.get (code, code)
+                 for code in self._type_code if code not in '<>!=@']
+        if self._fields:
+            types = [kind + ' ' + field
+                     for kind, field in zip (types, self._fields)]
+        return ("{:<12s} Record<{:s}>".format (self._name, ', '.join (types)))
+
+
+# ============================================================================
+
+## A queue whose items are records of several fields, such as a time stamp
+#  and the readings taken at that time.
+#
+#  When each reading has to go with the time it was taken, keeping readings
+#  and times in two queues takes two puts, each in its own critical section,
+#  and the two queues can get out of step if one fills up first. A record
+#  queue keeps each record in one slot of a preallocated @c bytearray packed
+#  with @c struct, so one @c put() stores a whole record and one @c get()
+#  returns it. @c get_into() copies many records at once as raw bytes, ready
+#  to be written to a serial port.
+#
+#  An example of the creation and use of a record queue is as follows:
+#  @code
+#  import task_share, utime
+#
+#  # Each record holds a time in milliseconds and two floats
+#  my_queue = task_share.RecordQueue ('<Iff', 20, ("time", "x", "y"),
+#                                     name="My Records")
+#
+#  # Somewhere in one task, put a record into the queue
+#  my_queue.try_put (utime.ticks_ms (), x, y)
+#
+#  # In another task, read a record, or send all the records over serial
+#  code, record = my_queue.try_get ()
+#  if code == task_share.OK:
+#      when, x, y = record
+#  count = my_queue.get_into (send_buffer)
+#  serial_port.write (memoryview (send_buffer)[:count * my_queue.record_size])
+#  @endcode
+class RecordQueue (BaseShare):
+
+    ## A counter used to give serial numbers to record queues.
+    ser_num = 0
+
+    ## Create a record queue.
+    #
+    #  The fields are given as a format string for the @c struct module,
+    #  one type code per field, using the type codes listed for @c Queue.
+    #  A byte order such as @c '<' may come first, which fixes the layout of
+    #  the records sent by @c get_into().
+    #  @param fmt The @c struct format of each record, such as @c '<Iff'
+    #  @param size The maximum number of records which the queue can hold
+    #  @param fields A tuple of the names of the fields, used in diagnostic
+    #         printouts, or @c None
+    #  @param thread_protect @c True if mutual exclusion protection is used
+    #  @param overwrite If @c True, the oldest record is overwritten with a
+    #         new one if the queue is full
+    #  @param name A short name for the queue, default @c RecordQueueN where
+    #         @c N is a serial number for the queue
+    def __init__ (self, fmt, size, fields = None, thread_protect = False,
+                  overwrite = False, name = None):
+        # First call the parent class initializer
+        super ().__init__ (fmt, thread_protect, name)
+
+        ## The number of bytes in each record
+        self.record_size = struct.calcsize (fmt)
+
+        self._size = size
+        self._fields = fields
+        self._overwrite = overwrite
+        self._name = str (name) if name != None \
+            else 'RecordQueue' + str (RecordQueue.ser_num)
+        RecordQueue.ser_num += 1
+
+        ## The @c struct format of the queue, which is sent along with its
+        #  records so that they can be unpacked on a computer
+        self.fmt = fmt
+
+        # Allocate memory for the records, and a view through which runs of
+        # records are copied out
+        self._buffer = bytearray (size * self.record_size)
+        self._view = memoryview (self._buffer)
+
+        self.clear ()
+
+
+    ## Try to put a record into the queue.
+    #
+    #  All the fields are packed into one slot within one critical section.
+    #  Like @c Queue.try_put() with no timeout, a record queue never waits
+    #  for room: if it's full, the oldest record is overwritten if
+    #  overwriting was chosen, and otherwise the new record is dropped and
+    #  counted.
+    #  @param values The value of each field, in order
+    #  @param in_ISR Set this to True if calling from within an ISR
+    #  @return @c OK if the record was stored or @c FULL if it was dropped
+    def try_put (self, *values, in_ISR = False):
+
+        # Disable interrupts before writing the data
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        if self._num_items >= self._size and not self._overwrite:
+            self._drops += 1
+            stored = False
+        else:
+            struct.pack_into (self._type_code, self._buffer,
+                              self._wr_idx * self.record_size, *values)
+            self._wr_idx += 1
+            if self._wr_idx >= self._size:
+                self._wr_idx = 0
+            if self._num_items < self._size:
+                self._num_items += 1
+            else:
+                self._rd_idx = self._wr_idx
+                self._evictions += 1
+            if self._num_items > self._max_full:
+                self._max_full = self._num_items
+            self._puts += 1
+            stored = True
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        # Wake up the task which uses the data
+        if stored and self._consumer is not None:
+            self._consumer.go ()
+
+        return OK if stored else FULL
+
+
+    ## Try to read and remove the oldest record from the queue without
+    #  waiting for one, as @c Queue.try_get() does with no timeout.
+    #
+    #  The record and result tuples are allocated, which can't be done in
+    #  an ISR, so an ISR should read records with @c get_into() instead.
+    #  @param in_ISR Must be @c False; @c True raises a @c ValueError
+    #  @return A tuple of a result code, @c OK or @c EMPTY, and a tuple
+    #          holding the value of each field, in order, or @c None if the
+    #          queue is empty
+    def try_get (self, in_ISR = False):
+        if in_ISR:
+            raise ValueError ("try_get() allocates; use get_into() in an ISR")
+
+        # Disable interrupts before reading the data
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+
+        if self._num_items > 0:
+            to_return = struct.unpack_from (self._type_code, self._buffer,
+                                            self._rd_idx * self.record_size)
+            self._rd_idx += 1
+            if self._rd_idx >= self._size:
+                self._rd_idx = 0
+            self._num_items -= 1
+            self._gets += 1
+        else:
+            to_return = None
+
+        # Re-enable interrupts
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+
+        return (EMPTY if to_return is None else OK), to_return
+
+
+    ## Remove as many records as fit from the queue and copy their bytes,
+    #  oldest first, into a buffer, within one critical section.
+    #
+    #  The records are copied exactly as they are packed, so the start of
+    #  the buffer can be written straight to a serial port and unpacked on a
+    #  computer with the same format.
+    #  @param buffer A @c bytearray or other writable buffer
+    #  @param in_ISR Set this to True if calling from within an ISR
+    #  @return The number of records copied into the buffer
+    def get_into (self, buffer, in_ISR = False):
+        dest = memoryview (buffer)
+        rec = self.record_size
+        size = self._size
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        count = self._num_items
+        if count > len (dest) // rec:
+            count = len (dest) // rec
+
+        # Copy the records out, wrapping around the end of the buffer at most
+        # once, then move the read pointer and adjust the number of records
+        if count > 0:
+            rd_idx = self._rd_idx
+            first = size - rd_idx
+            if first > count:
+                first = count
+            dest[:first * rec] = \
+                self._view[rd_idx * rec:(rd_idx + first) * rec]
+            if count > first:
+                dest[first * rec:count * rec] = \
+                    self._view[:(count - first) * rec]
+            rd_idx += count
+            if rd_idx >= size:
+                rd_idx -= size
+            self._rd_idx = rd_idx
+            self._num_items -= count
+            self._gets += count
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        return count
+
+
+    ## Check if there are any records in the queue.
+    #  @return @c True if records are in the queue, @c False if not
+    @micropython.native
+    def any (self):
+        return (self._num_items != 0)
+
+
+    ## Check if the queue is empty.
+    #  @return @c True if queue is empty, @c False if it's not empty
+    @micropython.native
+    def empty (self):
+        return (self._num_items == 0)
+
+
+    ## Check if the queue is full.
+    #  @return @c True if the queue is full
+    @micropython.native
+    def full (self):
+        return (self._num_items >= self._size)
+
+
+    ## Check how many records are in the queue.
+    #  @return The number of records in the queue
+    @micropython.native
+    def num_in (self):
+        return (self._num_items)
+
+
+    ## Remove all contents from the queue and reset its counters.
+    def clear (self):
+        self._rd_idx = 0
+        self._wr_idx = 0
+        self._num_items = 0
+        self._max_full = 0
+        self._puts = 0
+        self._gets = 0
+        self._drops = 0
+        self._evictions = 0
+        self._blocked_us = 0
+
+
+    ## Puts diagnostic information about the queue into a string.
+    #
+    #  It shows the same counts as for a @c Queue, with the type and, if
+    #  given, the name of each field.
+    def __repr__ (self):
+        types = [type_code_strings.get (code, code)
+                 for code in self._type_code if code not in '<>!=@']
+        if self._fields:
+            types = [kind + ' ' + field
+                     for kind, field in zip (types, self._fields)]
+        return ('{:<12s} RecordQueue<{:s}> Max Full {:d}/{:d} Puts {:d} '
+                'Gets {:d} Drops {:d} Evicted {:d}'.format (
+                self._name, ', '.join (types), self._max_full, self._size,
+                self._puts, self._gets, self._drops, self._evictions))
@@ -3,11 +3,12 @@
     Implemented as a cooperative multitasking generator.
 '''
 from pyb import USB_VCP
-from task_share import Share, Queue, BaseShare
+from task_share import Share, Queue, BaseShare, RecordShare
+from task_motor import ARC_LENGTH
+from cotask import Sleep, WaitQueue
 import micropython
 from utime import ticks_ms, ticks_diff
 import math
-from time import sleep
 
 # --- State constants ---
 S0_INIT  = micropython.const(0)  # Print help menu
@@ -27,20 +28,15 @@ class task_user:
     '''
 
     def __init__(self, leftMotorGo, rightMotorGo,
-                 dataValues_L, dataValues_R,
-                 timeValues_L, timeValues_R,
                  Ki, Kp, setpointLeft, setpointRight,
                  lineSensor, stepResponse, checkIMU,
                  crashDetect: Queue, buttonDetect: Queue,
-                 sL: Share, sR: Share, myIMU):       # <-- added sL, sR, myIMU
+                 leftRecord: RecordShare, rightRecord: RecordShare,
+                 myIMU):
         self._state = 0
 
         self._leftMotorGo   = leftMotorGo
         self._rightMotorGo  = rightMotorGo
-        self._dataValues_L  = dataValues_L
-        self._dataValues_R  = dataValues_R
-        self._timeValues_L  = timeValues_L
-        self._timeValues_R  = timeValues_R
         self._Kp = Kp
         self._Ki = Ki
         self._set_internal  = 100
@@ -52,8 +48,8 @@ class task_user:
         self._checkIMU      = checkIMU
         self._crashDetect   = crashDetect
         self._buttonDetect  = buttonDetect
-        self._sL            = sL       # left wheel arc length share [mm]
-        self._sR            = sR       # right wheel arc length share [mm]
+        self._leftRecord    = leftRecord   # left motor record, arc length [mm]
+        self._rightRecord   = rightRecord  # right motor record, arc length [mm]
         self._imu           = myIMU    # IMU object for heading reads
 
         self._ser = USB_VCP()
@@ -77,6 +73,15 @@ class task_user:
 
         self._calFlag = False
 
+        # Set by fault() when a motor task overruns its budget. It stays set,
+        # keeping the motors off, until run() has gone back to state 0
+        self._fault = False
+
+        # Wait objects yielded to the scheduler; they're made once here so
+        # that waiting doesn't allocate memory
+        self._pauseWait  = Sleep(1000)
+        self._buttonWait = WaitQueue(buttonDetect)
+
     def _println(self, text=""):
         self._ser.write(text + "\r\n")
 
@@ -99,15 +104,29 @@ class task_user:
         self._leftMotorGo.put(False)
         self._rightMotorGo.put(False)
 
+    def _start_motors(self):
+        '''Helper to set the go flags unless a fault stopped the motors.'''
+        if not self._fault:
+            self._leftMotorGo.put(True)
+            self._rightMotorGo.put(True)
+
+    def fault(self):
+        '''Stop both motors after a fault. The motors stay stopped and the
+           task goes back to state 0, so the button must be pressed to run
+           again.'''
+        self._fault = True
+        self._stop_motors()
+
     def pause(self):
-        sleep(1)
-        yield
+        '''Generator sub-routine: waits one second without holding up the
+           other tasks. Call with "yield from self.pause()" inside run().'''
+        yield self._pauseWait
 
     # -------------------------------------------------------------------------
     # drive_distance: move both wheels forward (or backward) a given distance.
     #
     # How it works:
-    #   - Records the starting arc length of each wheel from the sL/sR shares.
+    #   - Records the starting arc length of each wheel from the motor records.
     #   - Sets both motor setpoints to +speed (or -speed for negative distance).
     #   - Every time the scheduler calls run(), this generator yields so the
     #     motor task can actually run and turn the wheels.
@@ -129,8 +148,8 @@ class task_user:
         Call with "yield from self.drive_distance(300)" inside run().
         '''
         # Record where each wheel starts so we measure relative travel
-        start_L = self._sL.get()
-        start_R = self._sR.get()
+        start_L = self._leftRecord.get()[ARC_LENGTH]
+        start_R = self._rightRecord.get()[ARC_LENGTH]
 
         # Decide direction: if distance is negative we want to go backward
         direction = 1 if distance_mm >= 0 else -1
@@ -138,21 +157,20 @@ class task_user:
         spd       = abs(speed_mm_s) * direction
 
         # Enable motors and set constant forward (or backward) speed
-        self._leftMotorGo.put(True)
-        self._rightMotorGo.put(True)
+        self._start_motors()
         self._setpointLeft.put(spd)
         self._setpointRight.put(spd)
 
         # Keep looping (and yielding) until both wheels have covered the distance
         while True:
             # How far has each wheel traveled since we started?
-            traveled_L = abs(self._sL.get() - start_L)
-            traveled_R = abs(self._sR.get() - start_R)
+            traveled_L = abs(self._leftRecord.get()[ARC_LENGTH] - start_L)
+            traveled_R = abs(self._rightRecord.get()[ARC_LENGTH] - start_R)
 
             # Use the average so a slight mismatch doesn't stop us too soon
             avg_traveled = (traveled_L + traveled_R) / 2.0
 
-            if avg_traveled >= target:
+            if avg_traveled >= target or self._fault:
                 break   # Target reached — exit the loop
 
             yield   # Hand control back to the scheduler so motors keep running
@@ -255,8 +273,8 @@ class task_user:
         target_arc = (TRACK_WIDTH_MM / 2.0) * angle_rad   # mm each wheel must travel
 
         # Snapshot starting positions from the shares
-        start_L = self._sL.get()
-        start_R = self._sR.get()
+        start_L = self._leftRecord.get()[ARC_LENGTH]
+        start_R = self._rightRecord.get()[ARC_LENGTH]
 
         # CCW (positive): left goes backward, right goes forward
         # CW  (negative): left goes forward, right goes backward
@@ -267,15 +285,14 @@ class task_user:
             left_spd  =  40.0
             right_spd = -40.0
 
-        self._leftMotorGo.put(True)
-        self._rightMotorGo.put(True)
+        self._start_motors()
         self._setpointLeft.put(left_spd)
         self._setpointRight.put(right_spd)
 
         while True:
             # How far has each wheel actually traveled since the turn started?
-            traveled_L = abs(self._sL.get() - start_L)
-            traveled_R = abs(self._sR.get() - start_R)
+            traveled_L = abs(self._leftRecord.get()[ARC_LENGTH] - start_L)
+            traveled_R = abs(self._rightRecord.get()[ARC_LENGTH] - start_R)
             print(traveled_L)
 
             # Average both wheels in case of slight slip
@@ -284,6 +301,8 @@ class task_user:
             if avg_traveled >= target_arc:
                 print(f"total traveled: {avg_traveled}")
                 break
+            if self._fault:
+                break
                 
 
             yield   # Let motor task run
@@ -319,6 +338,13 @@ class task_user:
 
         while True:
 
+            # After a fault, wait in state 0 with the motors off until the
+            # button is pressed again
+            if self._fault:
+                self._fault = False
+                self._state = 0
+                self._printed = False
+
             # Change state on press of a button
             if self._buttonDetect.any():
                 self._buttonDetect.get()
@@ -365,8 +391,7 @@ class task_user:
                     self._stop_motors()
                     self._state = 0
 
-                self._leftMotorGo.put(True)
-                self._rightMotorGo.put(True)
+                self._start_motors()
 
                 checkHeading, _, _ = self._imu.get_euler_angles()
                 checkdiff = checkHeading - self._headingRef
@@ -433,7 +458,11 @@ class task_user:
                     self._crashDetect.get()
                     self._stop_motors()
                     self._state = 0
-                self._leftMotorGo.put(True)
-                self._rightMotorGo.put(True)
+                self._start_motors()
+
+            yield self._state
 
-            yield self._state
\ No newline at end of file
+            # States 0, 2 and 4 only wait for the button once their prompt has
+            # been printed, so park until the button queue has something in it
+            if self._printed and self._state in (0, 2, 4):
+                yield self._buttonWait
\ No newline at end of file